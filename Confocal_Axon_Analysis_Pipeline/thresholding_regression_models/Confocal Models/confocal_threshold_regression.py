@@ -9,18 +9,211 @@ This tool provides an interactive interface for:
 
 import os
 import json
+import concurrent.futures
+import hashlib
+import re
+import sys
+import tempfile
+import threading
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
 from datetime import datetime
 import ipywidgets as widgets
 from IPython.display import display, clear_output
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import r2_score
 import random
-from aicsimageio import AICSImage
+import nd2
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# numba can only reload its on-disk cache for modules importable by name, so
+# files executed from a path with importlib (as the notebooks do) skip it
+_NUMBA_CACHE = __name__ in sys.modules
+
+try:
+    import numexpr as ne
+    ne.set_num_threads(min(8, os.cpu_count() or 1))
+except ImportError:
+    ne = None
+
+# Biological replicate IDs embedded in .nd2 paths
+REPLICATES = ['B114', 'B115', 'B116', 'B117']
+REPLICATE_PATTERN = re.compile(r'B11[4-7]')
+
+
+def _iter_nd2_files(root):
+    """Recursively yield .nd2 paths under root using os.scandir."""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_nd2_files(entry.path)
+            elif entry.name.endswith('.nd2'):
+                yield entry.path
+
+
+def _replicate_of(path):
+    """Return the replicate ID found in a path, or None."""
+    match = REPLICATE_PATTERN.search(path)
+    return match.group(0) if match else None
+
+
+def _l1cam_frame_indices(f):
+    """
+    Select the ND2 frames that hold the L1CAM Z-planes.
+
+    Every loop other than Z (time, position, and channel when it is a loop)
+    is pinned to its first entry, matching AICSImage's
+    get_image_data("ZYX", C=0).
+
+    Args:
+        f (nd2.ND2File): Open ND2 file
+
+    Returns:
+        list: Sequence indices to pass to f.read_frame, in Z order
+    """
+    return [i for i, loops in enumerate(f.loop_indices)
+            if all(pos == 0 for axis, pos in loops.items() if axis != 'Z')]
+
+
+def _histogram_numpy(image, hist_out):
+    """NumPy fallback for _histogram when numba is not installed."""
+    hist_out[:] = np.bincount(image.ravel(), minlength=len(hist_out))
+
+
+if njit is not None:
+    @njit(cache=_NUMBA_CACHE)
+    def _histogram(image, hist_out):
+        """Count pixels per integer intensity of a 2D image in a single pass."""
+        hist_out[:] = 0
+        n_y, n_x = image.shape
+        for y in range(n_y):
+            for x in range(n_x):
+                hist_out[image[y, x]] += 1
+else:
+    _histogram = _histogram_numpy
+
+
+def _metric_from_histogram(hist, percentile):
+    """
+    Compute the percentile and mean above it from an intensity histogram.
+
+    Matches np.percentile (linear interpolation) followed by the mean of
+    values strictly above it, without sorting the pixels.
+
+    Args:
+        hist (np.ndarray): Pixel counts per integer intensity
+        percentile (float): Percentile used as the cut-off
+
+    Returns:
+        float: Mean intensity of pixels above the percentile
+    """
+    cum = np.cumsum(hist)
+    n = cum[-1]
+    if n == 0:
+        return 0.0
+
+    # Sorted values at the two ranks np.percentile interpolates between
+    rank = (n - 1) * percentile / 100.0
+    lo = int(np.floor(rank))
+    hi = min(lo + 1, n - 1)
+    v_lo = np.searchsorted(cum, lo, side='right')
+    v_hi = np.searchsorted(cum, hi, side='right')
+    thr = v_lo + (rank - lo) * (v_hi - v_lo)
+
+    # Pixels strictly above thr are those in bins floor(thr) + 1 and up
+    start = int(np.floor(thr)) + 1
+    counts = hist[start:]
+    count_above = counts.sum()
+    if count_above == 0:
+        return 0.0
+    return float(np.dot(np.arange(start, len(hist), dtype=np.float64), counts) / count_above)
+
+
+def compute_image_metric(image, percentile, hist_out=None):
+    """
+    Calculate the mean intensity above the given percentile of an image.
+
+    Unsigned 8/16-bit images (the usual .nd2 dtypes) use a single-pass
+    histogram; other dtypes fall back to np.percentile.
+
+    Args:
+        image (np.ndarray): 2D max intensity projection
+        percentile (float): Percentile used as the cut-off
+        hist_out (np.ndarray, optional): int64 buffer of at least
+            max(dtype) + 1 bins to reuse for the histogram
+
+    Returns:
+        float: Mean intensity of pixels above the percentile
+    """
+    if image.dtype in (np.uint8, np.uint16):
+        n_bins = np.iinfo(image.dtype).max + 1
+        if hist_out is None or len(hist_out) < n_bins:
+            hist_out = np.empty(1 << 16, dtype=np.int64)
+        hist = hist_out[:n_bins]
+        _histogram(image, hist)
+        return _metric_from_histogram(hist, percentile)
+
+    vals = image.ravel()
+    thr = np.percentile(vals, percentile)
+    above_thr = vals[vals > thr]
+    return above_thr.mean() if above_thr.size > 0 else 0.0
+
+
+def _threshold_into(image, threshold, out):
+    """
+    Write image > threshold into a preallocated bool array.
+
+    Uses numexpr's multi-threaded evaluation when it is installed and a
+    single-threaded np.greater otherwise.
+    """
+    if ne is not None:
+        ne.evaluate("image > threshold", local_dict={'image': image, 'threshold': threshold}, out=out)
+    else:
+        np.greater(image, threshold, out=out)
+
+
+def _fit_line(x, y):
+    """
+    Ordinary least-squares fit of y = intercept + slope * x.
+
+    If all x are equal the slope is 0 and the intercept is mean(y), as
+    with sklearn's LinearRegression.
+
+    Args:
+        x (np.ndarray): 1D feature values
+        y (np.ndarray): 1D targets
+
+    Returns:
+        tuple: (intercept, slope)
+    """
+    x_mean = x.mean()
+    y_mean = y.mean()
+    x_centered = x - x_mean
+    ss_x = np.dot(x_centered, x_centered)
+    slope = np.dot(x_centered, y - y_mean) / ss_x if ss_x > 0 else 0.0
+    return y_mean - slope * x_mean, slope
+
+
+def _r2(y, y_pred):
+    """
+    Coefficient of determination, 1 - SS_res / SS_tot.
+
+    A constant y gives 1.0 for a perfect fit and 0.0 otherwise, matching
+    sklearn's r2_score.
+    """
+    ss_res = np.sum((y - y_pred) ** 2)
+    ss_tot = np.sum((y - y.mean()) ** 2)
+    if ss_tot == 0:
+        return 1.0 if ss_res == 0 else 0.0
+    return 1.0 - ss_res / ss_tot
+
 
 class InteractiveRegressionTrainer:
-    def __init__(self, input_dir, num_files, min_threshold=0, max_threshold=500, threshold_step=1.0, metric_percentile=15, use_replicates=True):
+    def __init__(self, input_dir, num_files, min_threshold=0, max_threshold=500, threshold_step=1.0, metric_percentile=15, use_replicates=True, enable_cache=True):
         self.input_dir = input_dir
         self.num_files = num_files
         self.min_threshold = min_threshold
@@ -28,15 +221,21 @@ class InteractiveRegressionTrainer:
         self.threshold_step = threshold_step
         self.metric_percentile = metric_percentile
         self.use_replicates = use_replicates
+        self.enable_cache = enable_cache
         
-        # State variables
-        self.images = []
+        # State variables. Projections stay on disk and are loaded per display
+        self._mip_paths = []
+        self._cumulative_hists = []  # per image, for the coverage readout
+        self._sorted_pixels = {}  # per image index, for dtypes without a histogram
         self.image_paths = []
         self.current_image_idx = 0
         self.l1cam_thresholds = {}
         self.image_metrics = {}
         self.skipped_images = set()
         
+        # Per-thread scratch buffers reused by every load on that thread
+        self._scratch = threading.local()
+        
         # Load images
         self._load_images()
         
@@ -45,23 +244,18 @@ class InteractiveRegressionTrainer:
         print(f"Loading {self.num_files} images...")
         
         # Find all .nd2 files recursively
-        all_images = []
-        for root, _, files in os.walk(self.input_dir):
-            for file in files:
-                if file.endswith('.nd2'):
-                    all_images.append(os.path.join(root, file))
+        all_images = list(_iter_nd2_files(self.input_dir))
         
         if not all_images:
             raise ValueError(f"No .nd2 files found in {self.input_dir}")
         
         # Group files by replicate if using replicates
         if self.use_replicates:
-            replicate_files = {'B114': [], 'B115': [], 'B116': [], 'B117': []}
+            replicate_files = {rep: [] for rep in REPLICATES}
             for file_path in all_images:
-                for rep in replicate_files:
-                    if rep in file_path:
-                        replicate_files[rep].append(file_path)
-                        break
+                rep = _replicate_of(file_path)
+                if rep is not None:
+                    replicate_files[rep].append(file_path)
             
             # Sample evenly from each replicate
             selected_files = []
@@ -74,7 +268,8 @@ class InteractiveRegressionTrainer:
             # If we need more files to reach num_files, sample randomly from all remaining
             remaining_needed = self.num_files - len(selected_files)
             if remaining_needed > 0:
-                remaining_files = [f for f in all_images if f not in selected_files]
+                selected_set = set(selected_files)
+                remaining_files = [f for f in all_images if f not in selected_set]
                 if remaining_files:
                     selected_files.extend(random.sample(remaining_files, min(remaining_needed, len(remaining_files))))
         else:
@@ -83,90 +278,184 @@ class InteractiveRegressionTrainer:
         
         print(f"Loading {len(selected_files)} images...")
         
-        # Load each image with timeout and retry
-        from functools import partial
-        import signal
-        
-        def timeout_handler(signum, frame):
-            raise TimeoutError("Image loading timed out")
-        
-        # Set timeout for image loading (10 seconds)
-        signal.signal(signal.SIGALRM, timeout_handler)
-        
-        for file_path in selected_files:
-            retries = 3
-            while retries > 0:
-                try:
-                    signal.alarm(10)  # Set timeout
-                    
-                    # Load image data
-                    img = AICSImage(file_path)
-                    
-                    # Get L1CAM (FITC, C=0) channel
-                    l1cam_data = img.get_image_data("ZYX", C=0)
-                    
-                    signal.alarm(0)  # Disable timeout
-                    
-                    # Convert to max intensity projection if 3D
-                    if len(l1cam_data.shape) == 3:
-                        l1cam_data = np.max(l1cam_data, axis=0)
-                    
-                    # Calculate image metrics
-                    vals = l1cam_data.ravel()
-                    thr = np.percentile(vals, self.metric_percentile)
-                    above_thr = vals[vals > thr]
-                    mean_above = above_thr.mean() if above_thr.size > 0 else 0.0
-                    
-                    # Store image data
-                    self.images.append(l1cam_data)
-                    self.image_paths.append(file_path)
-                    self.image_metrics[file_path] = mean_above
-                    self.l1cam_thresholds[file_path] = None
-                    break  # Success, exit retry loop
-                    
-                except TimeoutError:
-                    print(f"Timeout loading {os.path.basename(file_path)}, {retries-1} retries left")
-                    retries -= 1
-                except Exception as e:
-                    print(f"Error loading {os.path.basename(file_path)}: {str(e)}, {retries-1} retries left")
-                    retries -= 1
-                finally:
-                    signal.alarm(0)  # Ensure timeout is disabled
+        # On-disk cache of projections so repeat sessions skip .nd2 decoding.
+        # Without it projections go to a temporary directory removed with the trainer
+        self._cache_dir = None
+        if self.enable_cache:
+            cache_dir = os.path.join(self.input_dir, ".mip_cache")
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                self._cache_dir = cache_dir
+            except OSError as e:
+                print(f"Could not create cache directory {cache_dir}: {str(e)}, caching disabled")
+        if self._cache_dir is None:
+            self._tmp_dir = tempfile.TemporaryDirectory(prefix="mip_")
+            self._cache_dir = self._tmp_dir.name
+        
+        # Load images concurrently with timeout and retry; .nd2 decoding
+        # releases the GIL so threads overlap the I/O and decompression.
+        # The timeout is a budget for waiting on each file, counted from when
+        # the results are collected in order, not a limit on its decode time
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(8, len(selected_files))))
+        try:
+            futures = {file_path: executor.submit(self._load_one, file_path) for file_path in selected_files}
             
-            if retries == 0:
-                print(f"Failed to load {os.path.basename(file_path)} after 3 attempts")
-        
-        if not self.images:
+            for file_path in selected_files:
+                future = futures[file_path]
+                retries = 3
+                timed_out = False
+                while retries > 0:
+                    try:
+                        mip_path, mean_above, cumulative_hist = future.result(timeout=10)
+                        timed_out = False
+                        
+                        # Store image data
+                        self._mip_paths.append(mip_path)
+                        self._cumulative_hists.append(cumulative_hist)
+                        self.image_paths.append(file_path)
+                        self.image_metrics[file_path] = mean_above
+                        self.l1cam_thresholds[file_path] = None
+                        break  # Success, exit retry loop
+                        
+                    except concurrent.futures.TimeoutError:
+                        # Keep waiting on the same load rather than starting a second one
+                        print(f"Timeout loading {os.path.basename(file_path)}, {retries-1} retries left")
+                        retries -= 1
+                        timed_out = True
+                    except Exception as e:
+                        print(f"Error loading {os.path.basename(file_path)}: {str(e)}, {retries-1} retries left")
+                        retries -= 1
+                        timed_out = False
+                        if retries > 0:
+                            future = executor.submit(self._load_one, file_path)
+                
+                if retries == 0:
+                    if timed_out and not future.cancel():
+                        # A running thread cannot be stopped. Its result is
+                        # dropped, though it may still finish writing the cache
+                        print(f"Skipping {os.path.basename(file_path)} after 3 timeouts; "
+                              f"its load keeps running in the background and its result is ignored")
+                    else:
+                        print(f"Failed to load {os.path.basename(file_path)} after 3 attempts")
+        finally:
+            # Do not block on loads that are still hung after their timeouts
+            executor.shutdown(wait=False)
+        
+        if not self.image_paths:
             raise RuntimeError("Failed to load any images successfully")
         
-        print(f"Successfully loaded {len(self.images)} images")
+        print(f"Successfully loaded {len(self.image_paths)} images")
         
         # Print replicate distribution if using replicates
         if self.use_replicates:
             rep_counts = {}
             for path in self.image_paths:
-                for rep in ['B114', 'B115', 'B116', 'B117']:
-                    if rep in path:
-                        rep_counts[rep] = rep_counts.get(rep, 0) + 1
-                        break
+                rep = _replicate_of(path)
+                if rep is not None:
+                    rep_counts[rep] = rep_counts.get(rep, 0) + 1
             print("\nReplicate distribution:")
             for rep, count in sorted(rep_counts.items()):
                 print(f"{rep}: {count} images")
     
+    def _cache_path(self, file_path):
+        """Cache file for an image's projection, keyed on its size and mtime"""
+        st = os.stat(file_path)
+        key_text = f"{os.path.abspath(file_path)}:{st.st_size}:{st.st_mtime_ns}"
+        key = hashlib.blake2b(key_text.encode()).hexdigest()[:16]
+        return os.path.join(self._cache_dir, f"{key}.npy")
+    
+    def _metric(self, mip):
+        """Mean above the metric percentile, reusing this thread's histogram buffer"""
+        hist = getattr(self._scratch, 'hist', None)
+        if hist is None:
+            hist = self._scratch.hist = np.empty(1 << 16, dtype=np.int64)
+        return compute_image_metric(mip, self.metric_percentile, hist_out=hist)
+    
+    def _cumulative_hist(self, mip):
+        """Pixel counts at or below each intensity from the histogram _metric just built, or None for other dtypes"""
+        if mip.dtype not in (np.uint8, np.uint16):
+            return None
+        return np.cumsum(self._scratch.hist[:np.iinfo(mip.dtype).max + 1])
+    
+    def _load_one(self, file_path):
+        """Write one .nd2 file's L1CAM max projection to disk and return its path, metric and cumulative histogram"""
+        cache_path = self._cache_path(file_path)
+        if os.path.exists(cache_path):
+            mip = np.load(cache_path, mmap_mode='r')
+            metric = self._metric(mip)
+            return cache_path, metric, self._cumulative_hist(mip)
+        
+        # nd2 reads the file's chunk map instead of scanning every chunk header
+        with nd2.ND2File(file_path) as f:
+            # Fold each L1CAM (FITC, C=0) Z-plane into the max intensity
+            # projection. read_frame returns a view on the memory-mapped file
+            # for uncompressed data, so no plane or stack copy is made. The
+            # projection only lives until it is saved, so it is built in a
+            # per-thread scratch buffer reused while the frame shape is unchanged
+            mip = None
+            for frame_index in _l1cam_frame_indices(f):
+                plane = f.read_frame(frame_index)
+                if plane.ndim == 3:
+                    plane = plane[0]  # Channels stored within the frame
+                if mip is None:
+                    mip = getattr(self._scratch, 'mip', None)
+                    if mip is None or mip.shape != plane.shape or mip.dtype != plane.dtype:
+                        mip = self._scratch.mip = np.empty_like(plane)
+                    mip[...] = plane
+                else:
+                    np.maximum(mip, plane, out=mip)
+        
+        metric = self._metric(mip)
+        cumulative_hist = self._cumulative_hist(mip)
+        
+        # Write to a temporary name first so an interrupted save is never read back
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, mip)
+        os.replace(tmp_path, cache_path)
+        
+        return cache_path, metric, cumulative_hist
+    
     def _update_display(self):
         """Update the display with current image and controls"""
-        if not self.images:
+        if not self.image_paths:
             print("No images loaded!")
             return
         
-        # Create the display elements
+        # Create the display elements. The projection is memory-mapped from
+        # disk so only the image on screen is resident
         current_path = self.image_paths[self.current_image_idx]
-        current_image = self.images[self.current_image_idx]
+        current_image = np.load(self._mip_paths[self.current_image_idx], mmap_mode='r')
         current_metric = self.image_metrics[current_path]
         current_threshold = self.l1cam_thresholds.get(current_path, self.min_threshold)
         
-        # Create binary mask
-        binary_mask = current_image > (current_threshold if current_threshold is not None else self.min_threshold)
+        # Create binary mask in a scratch buffer reused on every slider tick
+        self._mask_buf = np.empty(current_image.shape, dtype=bool)
+        _threshold_into(current_image, current_threshold if current_threshold is not None else self.min_threshold, self._mask_buf)
+        
+        # The coverage readout is a lookup per tick: into the cumulative
+        # histogram built at load time for 8/16-bit projections, otherwise a
+        # binary search in the pixels sorted on the image's first display
+        cumulative_hist = self._cumulative_hists[self.current_image_idx]
+        if cumulative_hist is not None:
+            n_pixels = cumulative_hist[-1]
+            
+            def pixels_at_or_below(threshold):
+                if threshold < 0:
+                    return 0
+                return cumulative_hist[min(int(threshold), len(cumulative_hist) - 1)]
+        else:
+            sorted_pixels = self._sorted_pixels.get(self.current_image_idx)
+            if sorted_pixels is None:
+                sorted_pixels = self._sorted_pixels[self.current_image_idx] = np.sort(current_image, axis=None)
+            n_pixels = sorted_pixels.size
+            
+            def pixels_at_or_below(threshold):
+                return np.searchsorted(sorted_pixels, threshold, side='right')
+        
+        def coverage_html(threshold):
+            above = 1.0 - pixels_at_or_below(threshold) / n_pixels
+            return f"Pixels above threshold: {above * 100:.2f}%"
         
         # Create figure
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
@@ -176,8 +465,10 @@ class InteractiveRegressionTrainer:
         ax1.set_title('L1CAM Image')
         ax1.axis('off')
         
-        # Plot binary mask
-        ax2.imshow(binary_mask, cmap='gray')
+        # Plot binary mask, keeping the artist so the slider only swaps its data.
+        # The bool buffer is viewed as uint8 (no copy) and drawn without
+        # resampling interpolation, which is wasted work on a 0/1 mask
+        self._mask_artist = ax2.imshow(self._mask_buf.view(np.uint8), cmap='gray', vmin=0, vmax=1, interpolation='nearest')
         ax2.set_title(f'Binary Mask (Threshold: {current_threshold if current_threshold is not None else "Not Set"})')
         ax2.axis('off')
         
@@ -199,7 +490,7 @@ class InteractiveRegressionTrainer:
         skip_button = widgets.Button(description='Skip')
         
         # Navigation info
-        progress_text = f"Image {self.current_image_idx + 1}/{len(self.images)}"
+        progress_text = f"Image {self.current_image_idx + 1}/{len(self.image_paths)}"
         if current_path in self.skipped_images:
             progress_text += " (Skipped)"
         progress = widgets.HTML(value=f"<b>{progress_text}</b>")
@@ -208,10 +499,7 @@ class InteractiveRegressionTrainer:
         image_name = os.path.basename(current_path)
         replicate = "Unknown"
         if self.use_replicates:
-            for rep in ['B114', 'B115', 'B116', 'B117']:
-                if rep in current_path:
-                    replicate = rep
-                    break
+            replicate = _replicate_of(current_path) or "Unknown"
         info_text = f"""
         <b>Image info:</b><br>
         File: {image_name}<br>
@@ -219,10 +507,11 @@ class InteractiveRegressionTrainer:
         Mean above {self.metric_percentile}th percentile: {current_metric:.2f}
         """
         info = widgets.HTML(value=info_text)
+        coverage = widgets.HTML(value=coverage_html(slider.value))
         
         # Layout
         button_box = widgets.HBox([prev_button, next_button, skip_button, finish_button])
-        display(widgets.VBox([progress, info, slider, button_box]))
+        display(widgets.VBox([progress, info, slider, coverage, button_box]))
         
         def on_threshold_change(change):
             if change['type'] == 'change' and change['name'] == 'value':
@@ -230,12 +519,11 @@ class InteractiveRegressionTrainer:
                 new_threshold = change['new']
                 self.l1cam_thresholds[current_path] = new_threshold
                 
-                # Update binary mask
-                binary_mask = current_image > new_threshold
-                ax2.clear()
-                ax2.imshow(binary_mask, cmap='gray')
+                # Update binary mask in place instead of rebuilding the axes
+                _threshold_into(current_image, new_threshold, self._mask_buf)
+                self._mask_artist.set_data(self._mask_buf.view(np.uint8))
                 ax2.set_title(f'Binary Mask (Threshold: {new_threshold:.1f})')
-                ax2.axis('off')
+                coverage.value = coverage_html(new_threshold)
                 fig.canvas.draw_idle()
         
         def on_prev_click(b):
@@ -246,7 +534,7 @@ class InteractiveRegressionTrainer:
                 self._update_display()
         
         def on_next_click(b):
-            if self.current_image_idx < len(self.images) - 1:
+            if self.current_image_idx < len(self.image_paths) - 1:
                 self.current_image_idx += 1
                 plt.close(fig)
                 clear_output(wait=True)
@@ -254,7 +542,7 @@ class InteractiveRegressionTrainer:
         
         def on_skip_click(b):
             self.skipped_images.add(current_path)
-            if self.current_image_idx < len(self.images) - 1:
+            if self.current_image_idx < len(self.image_paths) - 1:
                 self.current_image_idx += 1
                 plt.close(fig)
                 clear_output(wait=True)
@@ -285,12 +573,7 @@ class InteractiveRegressionTrainer:
                 X.append([self.image_metrics[path]])
                 y.append(threshold)
                 if self.use_replicates:
-                    rep = "Unknown"
-                    for r in ['B114', 'B115', 'B116', 'B117']:
-                        if r in path:
-                            rep = r
-                            break
-                    replicates.append(rep)
+                    replicates.append(_replicate_of(path) or "Unknown")
         
         if not X:
             print("No valid thresholds collected!")
@@ -309,45 +592,38 @@ class InteractiveRegressionTrainer:
         }
         
         if self.use_replicates:
-            # Calculate replicate offsets
-            unique_reps = sorted(set(replicates))
-            rep_offsets = {}
-            base_predictions = []
+            # Calculate replicate offsets; rep_index maps each sample to its replicate
+            unique_reps, rep_index = np.unique(np.asarray(replicates), return_inverse=True)
+            unique_reps = unique_reps.tolist()
             
             # First, fit model without replicate offsets
-            base_model = LinearRegression()
-            base_model.fit(X, y)
-            model_data['intercept'] = float(base_model.intercept_)
-            model_data['metric_coefficient'] = float(base_model.coef_[0])
+            intercept, slope = _fit_line(X[:, 0], y)
+            model_data['intercept'] = float(intercept)
+            model_data['metric_coefficient'] = float(slope)
             
             # Calculate base predictions
-            base_predictions = base_model.predict(X)
+            base_predictions = intercept + slope * X[:, 0]
             
-            # Calculate offsets for each replicate
-            for rep in unique_reps:
-                rep_mask = np.array(replicates) == rep
-                if np.any(rep_mask):
-                    offset = np.mean(y[rep_mask] - base_predictions[rep_mask])
-                    rep_offsets[rep] = float(offset)
+            # Offset for each replicate is its mean residual, in one grouped pass
+            residuals = y - base_predictions
+            offsets = np.bincount(rep_index, weights=residuals) / np.bincount(rep_index)
+            rep_offsets = {rep: float(offset) for rep, offset in zip(unique_reps, offsets)}
             
             model_data['replicate_offsets'] = rep_offsets
             
             # Calculate R² score with replicate offsets
-            y_pred = base_predictions.copy()
-            for i, rep in enumerate(replicates):
-                y_pred[i] += rep_offsets.get(rep, 0.0)
-            r2 = r2_score(y, y_pred)
+            y_pred = base_predictions + offsets[rep_index]
+            r2 = _r2(y, y_pred)
             model_data['r2_score'] = float(r2)
             
         else:
             # Simple linear regression without replicate offsets
-            model = LinearRegression()
-            model.fit(X, y)
+            intercept, slope = _fit_line(X[:, 0], y)
             model_data.update({
-                'intercept': float(model.intercept_),
-                'metric_coefficient': float(model.coef_[0]),
+                'intercept': float(intercept),
+                'metric_coefficient': float(slope),
                 'replicate_offsets': {},
-                'r2_score': float(r2_score(y, model.predict(X)))
+                'r2_score': float(_r2(y, intercept + slope * X[:, 0]))
             })
         
         # Save model
@@ -389,36 +665,45 @@ class InteractiveRegressionTrainer:
                     f.write(f"{key}: {value}\n")
         
         # Create scatter plot
-        plt.figure(figsize=(10, 6))
+        fig, ax = plt.subplots(figsize=(10, 6))
         if self.use_replicates:
-            # Plot points with different colors for each replicate
-            for rep in unique_reps:
-                mask = np.array(replicates) == rep
-                plt.scatter(X[mask], y[mask], alpha=0.5, label=f'Replicate {rep}')
+            # One scatter for all points, colored by replicate
+            rep_colors = plt.cm.tab10(np.arange(len(unique_reps)) % 10)
+            ax.scatter(X[:, 0], y, c=rep_colors[rep_index], alpha=0.5)
             
             # Plot regression line with offsets
-            x_range = np.linspace(X.min(), X.max(), 100).reshape(-1, 1)
-            base_pred = model_data['intercept'] + model_data['metric_coefficient'] * x_range.flatten()
-            plt.plot(x_range, base_pred, 'k--', label='Base regression', alpha=0.5)
+            x_range = np.linspace(X.min(), X.max(), 100)
+            base_pred = model_data['intercept'] + model_data['metric_coefficient'] * x_range
+            base_line, = ax.plot(x_range, base_pred, 'k--', label='Base regression', alpha=0.5)
+            
+            # All replicate-adjusted lines as a single LineCollection
+            adjusted = base_pred[np.newaxis, :] + offsets[:, np.newaxis]
+            segments = np.stack(np.broadcast_arrays(x_range, adjusted), axis=-1)
+            ax.add_collection(LineCollection(segments, colors=rep_colors, alpha=0.7))
+            ax.autoscale_view()
             
-            for rep in unique_reps:
-                offset = model_data['replicate_offsets'].get(rep, 0.0)
-                plt.plot(x_range, base_pred + offset, '-', label=f'{rep} adjusted', alpha=0.7)
+            # Legend from proxy artists, in the same order as before
+            point_handles = [Line2D([], [], marker='o', linestyle='', color=c, alpha=0.5, label=f'Replicate {rep}')
+                             for rep, c in zip(unique_reps, rep_colors)]
+            line_handles = [Line2D([], [], color=c, alpha=0.7, label=f'{rep} adjusted')
+                            for rep, c in zip(unique_reps, rep_colors)]
+            ax.legend(handles=point_handles + [base_line] + line_handles)
         else:
-            plt.scatter(X, y, alpha=0.5, label='Training Data')
+            ax.scatter(X, y, alpha=0.5, label='Training Data')
             x_range = np.linspace(X.min(), X.max(), 100).reshape(-1, 1)
             y_pred = model_data['intercept'] + model_data['metric_coefficient'] * x_range.flatten()
-            plt.plot(x_range, y_pred, 'r-', label='Regression Line')
+            ax.plot(x_range, y_pred, 'r-', label='Regression Line')
+            ax.legend()
         
-        plt.xlabel(f'Mean Above {self.metric_percentile}th Percentile')
-        plt.ylabel('Threshold')
-        plt.title('Threshold Regression Model')
-        plt.legend()
+        ax.set_xlabel(f'Mean Above {self.metric_percentile}th Percentile')
+        ax.set_ylabel('Threshold')
+        ax.set_title('Threshold Regression Model')
         
         # Save plot
         plot_path = os.path.join(models_dir, f'confocal_regression_plot_{timestamp}.png')
-        plt.savefig(plot_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        # A scatter of a few dozen points does not need print resolution
+        fig.savefig(plot_path, dpi=120, bbox_inches='tight', pil_kwargs={'optimize': True})
+        plt.close(fig)
         
         # Print success message
         print("✨ Regression model created successfully!")
@@ -436,7 +721,7 @@ class InteractiveRegressionTrainer:
     
     def run(self):
         """Run the interactive training interface"""
-        if not self.images:
+        if not self.image_paths:
             print("No images loaded!")
             return
         
@@ -449,7 +734,7 @@ class InteractiveRegressionTrainer:
         
         self._update_display()
 
-def create_interactive_model(input_dir, num_files=10, min_threshold=0, max_threshold=500, threshold_step=1.0, metric_percentile=15, use_replicates=True):
+def create_interactive_model(input_dir, num_files=10, min_threshold=0, max_threshold=500, threshold_step=1.0, metric_percentile=15, use_replicates=True, enable_cache=True):
     """
     Create an interactive regression model training interface.
     
@@ -461,6 +746,7 @@ def create_interactive_model(input_dir, num_files=10, min_threshold=0, max_thres
         threshold_step (float): Step size for threshold slider
         metric_percentile (float): Percentile for calculating mean above value
         use_replicates (bool): Whether to use replicate-specific offsets
+        enable_cache (bool): Whether to cache projections under input_dir/.mip_cache
     
     Returns:
         None (saves model interactively)
@@ -478,6 +764,7 @@ def create_interactive_model(input_dir, num_files=10, min_threshold=0, max_thres
         max_threshold,
         threshold_step,
         metric_percentile,
-        use_replicates
+        use_replicates,
+        enable_cache
     )
     trainer.run()
\ No newline at end of file
@@ -4,13 +4,44 @@ Handles configuration loading, path management, and analysis execution.
 """
 
 import os
+import copy
+import functools
 import yaml
 import glob
 import shutil
+import sys
+from types import ModuleType
 from typing import List, Dict, Optional
 from config_manager import AnalysisConfig
 import importlib.util
 
+# Prefer the libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# Analysis module, loaded on first use and reloaded only when the file changes
+_ANALYSIS_PATH = os.path.join(os.path.dirname(__file__), "branch-based-snakes.py")
+_ANALYSIS_MODULE: Optional[ModuleType] = None
+_ANALYSIS_MTIME_NS: Optional[int] = None
+
+
+@functools.lru_cache(maxsize=8)
+def _load_yaml_cached(path: str, mtime_ns: int) -> Dict:
+    """
+    Parse a YAML file, reusing the result until the file is modified.
+    
+    Args:
+        path: Path to the YAML file
+        mtime_ns: Modification time of the file, part of the cache key
+        
+    Returns:
+        Parsed YAML contents (shared; copy before mutating)
+    """
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=_YamlLoader)
+
 def load_and_configure_analysis(
     input_dir: str,
     output_dir: str,
@@ -29,28 +60,25 @@ def load_and_configure_analysis(
     """
     # Get groups and conditions from directory structure
     # First level directories are bioreplicates (no name requirements)
-    groups = sorted([d for d in os.listdir(input_dir) 
-                    if os.path.isdir(os.path.join(input_dir, d))])
+    groups = sorted(entry.name for entry in os.scandir(input_dir) if entry.is_dir())
     
     conditions = []
     if groups:
         # Get conditions from first group (assuming all groups have same conditions)
         group_path = os.path.join(input_dir, groups[0])
         # Second level directories are conditions (no name requirements)
-        conditions = sorted([d for d in os.listdir(group_path) 
-                           if os.path.isdir(os.path.join(group_path, d))])
+        conditions = sorted(entry.name for entry in os.scandir(group_path) if entry.is_dir())
     
     print(f"Found {len(groups)} groups: {groups}")
     print(f"Found {len(conditions)} conditions: {conditions}")
     
     # Load configuration
     config_path = os.path.join(active_config_dir, "config.yaml")
-    with open(config_path, 'r') as f:
-        base_config = yaml.safe_load(f)
-        print(f"\nLoaded configuration from: {config_path}")
+    base_config = _load_yaml_cached(config_path, os.stat(config_path).st_mtime_ns)
+    print(f"\nLoaded configuration from: {config_path}")
     
     # Convert data_output_dir to output_dir if needed
-    config_dict = base_config.copy()
+    config_dict = copy.deepcopy(base_config)
     if 'data_output_dir' in config_dict:
         config_dict['output_dir'] = config_dict.pop('data_output_dir')
     
@@ -85,6 +113,25 @@ def load_and_configure_analysis(
     
     return config
 
+def _get_analysis_module() -> ModuleType:
+    """
+    Return the branch-based-snakes analysis module, loading it if needed.
+    
+    Returns:
+        The loaded module, reused across calls until its source is modified
+    """
+    global _ANALYSIS_MODULE, _ANALYSIS_MTIME_NS
+    mtime_ns = os.stat(_ANALYSIS_PATH).st_mtime_ns
+    if _ANALYSIS_MODULE is None or mtime_ns != _ANALYSIS_MTIME_NS:
+        spec = importlib.util.spec_from_file_location("branch_based_snakes", _ANALYSIS_PATH)
+        module = importlib.util.module_from_spec(spec)
+        # Registered by name so its functions can be pickled for worker processes
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+        _ANALYSIS_MODULE = module
+        _ANALYSIS_MTIME_NS = mtime_ns
+    return _ANALYSIS_MODULE
+
 def run_analysis(config: AnalysisConfig) -> None:
     """
     Run the analysis using the provided configuration.
@@ -93,12 +140,7 @@ def run_analysis(config: AnalysisConfig) -> None:
         config: AnalysisConfig object with analysis parameters
     """
     # Import analysis module
-    spec = importlib.util.spec_from_file_location(
-        "branch_based_snakes",
-        os.path.join(os.path.dirname(__file__), "branch-based-snakes.py")
-    )
-    analysis_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(analysis_module)
+    analysis_module = _get_analysis_module()
     
     # Run analysis
     print("\nStarting analysis...\n")
@@ -1,23 +1,973 @@
-from aicsimageio import AICSImage
+import nd2
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.colors import hsv_to_rgb
 from skimage import exposure
 from skimage.filters import threshold_otsu
 import os
-from skimage.morphology import skeletonize, remove_small_objects, label, closing, opening, disk, dilation, reconstruction
-from skimage.measure import regionprops
+from skimage.morphology import skeletonize, label, closing, opening, disk, dilation, reconstruction
 from skimage.color import label2rgb
 from scipy.ndimage import gaussian_filter, convolve, distance_transform_edt
 import pandas as pd
 import re
 from collections import defaultdict
-from scipy.stats import ecdf
+from scipy.stats import ecdf, f_oneway
 import glob
+import json
 import scipy.ndimage as ndimage
 import sys
 import argparse
+import multiprocessing as mp
+import importlib.machinery
+from functools import lru_cache
 from config_manager import load_config, AnalysisConfig
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    from imops import binary_opening as _imops_opening, binary_closing as _imops_closing, binary_dilation as _imops_dilation
+except ImportError:
+    _imops_opening = _imops_closing = _imops_dilation = None
+
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
+try:
+    from edt import edt as _edt
+except ImportError:
+    _edt = None
+
+# numba can only reload its on-disk cache for modules importable by name, so
+# files executed from a path with importlib (as the notebooks do) skip it
+_NUMBA_CACHE = __name__ in sys.modules
+
+
+def _pink_spiders_python(skeleton, branch_ys, branch_xs, window_length, neighbor_count,
+                         radius_map, density_threshold, thickness_threshold, pink_mask):
+    """Python fallback for _pink_spiders when numba is not installed."""
+    height, width = skeleton.shape
+    # Pixels are packed as y * width + x; the skeleton and the visited marks
+    # are byte strings so each neighbour test is a plain index, not a tuple hash
+    skel_bytes = skeleton.astype(np.uint8).tobytes()
+    visited = bytearray(height * width)
+    # Spiders are concatenated and their metrics reduced in one call at the end
+    all_reached = []
+    lengths = []
+    for by, bx in zip(branch_ys, branch_xs):
+        # All skeleton pixels reachable within window_length steps
+        start = int(by) * width + int(bx)
+        visited[start] = 1
+        reached = [start]
+        frontier = [start]
+        for _ in range(window_length):
+            new_frontier = []
+            for lin in frontier:
+                y, x = divmod(lin, width)
+                for dy in (-1, 0, 1):
+                    ny = y + dy
+                    if ny < 0 or ny >= height:
+                        continue
+                    for dx in (-1, 0, 1):
+                        nx = x + dx
+                        if (dy == 0 and dx == 0) or nx < 0 or nx >= width:
+                            continue
+                        nlin = ny * width + nx
+                        if skel_bytes[nlin] and not visited[nlin]:
+                            visited[nlin] = 1
+                            new_frontier.append(nlin)
+            if not new_frontier:
+                break
+            reached.extend(new_frontier)
+            frontier = new_frontier
+        for lin in reached:
+            visited[lin] = 0
+        all_reached.extend(reached)
+        lengths.append(len(reached))
+    if not lengths:
+        return
+
+    # Calculate the metrics of every spider with one segmented reduction
+    lengths = np.array(lengths)
+    starts = np.cumsum(lengths) - lengths
+    # Gather through flat views with the packed indices; only painting needs (y, x)
+    lin = np.fromiter(all_reached, dtype=np.intp, count=len(all_reached))
+    branch_cnt = np.add.reduceat((neighbor_count.ravel()[lin] >= 3).astype(np.int64), starts)
+    thick_sum = np.add.reduceat(radius_map.ravel()[lin].astype(np.float64), starts)
+    density = branch_cnt / lengths
+    avg_thick = thick_sum / lengths
+
+    # Pink criterion
+    is_pink = np.repeat((density > density_threshold) & (avg_thick >= thickness_threshold), lengths)
+    pink_mask[np.divmod(lin[is_pink], width)] = True
+
+
+if njit is not None:
+    @njit(cache=_NUMBA_CACHE)
+    def _pink_spiders(skeleton, branch_ys, branch_xs, window_length, neighbor_count,
+                      radius_map, density_threshold, thickness_threshold, pink_mask):
+        """
+        Grow a spider from each branch point and paint the dense, thick ones pink.
+
+        A spider is every skeleton pixel reachable from the branch point within
+        window_length 8-connected steps. It is painted into pink_mask when its
+        branch point density exceeds density_threshold and its mean radius is
+        at least thickness_threshold.
+        """
+        height, width = skeleton.shape
+        # Visited pixels are stamped with the spider number, so the array is
+        # never cleared between spiders
+        stamp = np.zeros((height, width), dtype=np.int32)
+        # A spider cannot leave the (2 * window_length + 1)^2 box around its start
+        queue_size = min(height * width, (2 * window_length + 1) ** 2)
+        queue_y = np.empty(queue_size, dtype=np.int32)
+        queue_x = np.empty(queue_size, dtype=np.int32)
+
+        for s in range(len(branch_ys)):
+            stamp_val = s + 1
+            queue_y[0] = branch_ys[s]
+            queue_x[0] = branch_xs[s]
+            stamp[branch_ys[s], branch_xs[s]] = stamp_val
+            head = 0
+            tail = 1
+
+            # Breadth-first search, one ring of the queue per step
+            for _ in range(window_length):
+                level_end = tail
+                while head < level_end:
+                    y = queue_y[head]
+                    x = queue_x[head]
+                    head += 1
+                    for dy in range(-1, 2):
+                        ny = y + dy
+                        if ny < 0 or ny >= height:
+                            continue
+                        for dx in range(-1, 2):
+                            nx = x + dx
+                            if (dy == 0 and dx == 0) or nx < 0 or nx >= width:
+                                continue
+                            if skeleton[ny, nx] and stamp[ny, nx] != stamp_val:
+                                stamp[ny, nx] = stamp_val
+                                queue_y[tail] = ny
+                                queue_x[tail] = nx
+                                tail += 1
+                if tail == level_end:
+                    break
+
+            # Calculate metrics inside this spider
+            branch_cnt = 0
+            thick_sum = 0.0
+            for k in range(tail):
+                if neighbor_count[queue_y[k], queue_x[k]] >= 3:
+                    branch_cnt += 1
+                thick_sum += radius_map[queue_y[k], queue_x[k]]
+            density = branch_cnt / tail
+            avg_thick = thick_sum / tail
+
+            # Pink criterion
+            if density > density_threshold and avg_thick >= thickness_threshold:
+                for k in range(tail):
+                    pink_mask[queue_y[k], queue_x[k]] = True
+else:
+    _pink_spiders = _pink_spiders_python
+
+
+def _component_means_numpy(labeled, radius_map, num_components):
+    """NumPy fallback for _component_means when numba is not installed."""
+    return ndimage.mean(radius_map, labels=labeled, index=np.arange(1, num_components + 1))
+
+
+if njit is not None:
+    @njit(cache=_NUMBA_CACHE)
+    def _component_means(labeled, radius_map, num_components):
+        """Mean radius of every labeled component (labels 1..num_components) in one pass."""
+        sums = np.zeros(num_components + 1)
+        counts = np.zeros(num_components + 1, dtype=np.int64)
+        n_y, n_x = labeled.shape
+        for y in range(n_y):
+            for x in range(n_x):
+                lab = labeled[y, x]
+                if lab:
+                    sums[lab] += radius_map[y, x]
+                    counts[lab] += 1
+        return sums[1:] / counts[1:]
+else:
+    _component_means = _component_means_numpy
+
+
+def count_neighbors_u8(skel: np.ndarray) -> np.ndarray:
+    """
+    Count the 8-connected neighbours of every pixel of a 0/1 uint8 skeleton.
+
+    Equivalent to a zero-padded convolution with a 3x3 ring kernel, done as
+    eight shifted slice additions into a uint8 accumulator.
+    """
+    acc = np.zeros(skel.shape, dtype=np.uint8)
+    acc[1:, :] += skel[:-1, :]
+    acc[:-1, :] += skel[1:, :]
+    acc[:, 1:] += skel[:, :-1]
+    acc[:, :-1] += skel[:, 1:]
+    acc[1:, 1:] += skel[:-1, :-1]
+    acc[1:, :-1] += skel[:-1, 1:]
+    acc[:-1, 1:] += skel[1:, :-1]
+    acc[:-1, :-1] += skel[1:, 1:]
+    return acc
+
+
+def percentile_select(vals, percentile):
+    """
+    np.percentile with linear interpolation, using selection instead of a sort.
+
+    np.partition places the two order statistics the percentile falls
+    between in O(N), without sorting the whole array.
+    """
+    rank = percentile / 100.0 * (vals.size - 1)
+    lo = int(np.floor(rank))
+    hi = min(lo + 1, vals.size - 1)
+    part = np.partition(vals, [lo, hi])
+    v_lo = float(part[lo])
+    v_hi = float(part[hi])
+    # Interpolate from the nearer neighbour, as np.percentile does
+    t = rank - lo
+    if t >= 0.5:
+        return v_hi - (v_hi - v_lo) * (1 - t)
+    return v_lo + (v_hi - v_lo) * t
+
+
+def fast_gaussian(img, sigma):
+    """
+    Approximate a Gaussian blur with three successive box filters.
+
+    Box widths follow the usual odd-width split so the cascade's variance is
+    as close to sigma**2 as integer widths allow. Returns float32.
+    """
+    n_passes = 3
+    w_lo = int(np.sqrt(12 * sigma * sigma / n_passes + 1))
+    if w_lo % 2 == 0:
+        w_lo -= 1
+    w_hi = w_lo + 2
+    # Number of passes that use the narrower box
+    n_lo = round((12 * sigma * sigma - n_passes * w_lo * w_lo - 4 * n_passes * w_lo - 3 * n_passes) / (-4 * w_lo - 4))
+    out = img.astype(np.float32)
+    for i in range(n_passes):
+        out = ndimage.uniform_filter(out, size=w_lo if i < n_lo else w_hi, mode='reflect')
+    return out
+
+
+# Structuring elements are shared across files and min_sizes; callers must not modify them
+_disk = lru_cache(maxsize=32)(disk)
+
+def _binary_opening(mask, footprint, num_threads=-1):
+    """Binary opening with imops' threaded kernel when installed, else scikit-image."""
+    if _imops_opening is not None:
+        return _imops_opening(mask, footprint.astype(bool), num_threads=num_threads)
+    return opening(mask, footprint)
+
+
+def _binary_closing(mask, footprint, num_threads=-1):
+    """Binary closing with imops' threaded kernel when installed, else scikit-image."""
+    if _imops_closing is not None:
+        return _imops_closing(mask, footprint.astype(bool), num_threads=num_threads)
+    return closing(mask, footprint)
+
+
+def _binary_dilation(mask, footprint, num_threads=-1):
+    """Binary dilation with imops' threaded kernel when installed, else scikit-image."""
+    if _imops_dilation is not None:
+        return _imops_dilation(mask, footprint.astype(bool), num_threads=num_threads)
+    return dilation(mask, footprint)
+
+
+def _brighten(img, gamma):
+    """Gamma-brighten an image rescaled to [0, 1] for display, in one numexpr pass when installed."""
+    if ne is not None:
+        return ne.evaluate("where(img > 1, 1, where(img < 0, 0, img)) ** gamma",
+                           local_dict={'img': img, 'gamma': np.float32(gamma)})
+    return np.clip(img ** gamma, 0, 1)
+
+
+def _nd2_max_projections(f, channel_indices):
+    """
+    Max-project the given channels of an open ND2 file over Z.
+
+    Frames are read one at a time and folded into the projections, so the
+    Z-stack is never materialized. Loops other than Z are pinned to their
+    first entry, matching AICSImage's default scene and time point.
+
+    Args:
+        f (nd2.ND2File): Open ND2 file
+        channel_indices (list): Channel indices to project
+
+    Returns:
+        list: One 2D max projection per entry of channel_indices
+    """
+    projections = [None] * len(channel_indices)
+    for frame_index, loops in enumerate(f.loop_indices):
+        if any(pos != 0 for axis, pos in loops.items() if axis != 'Z'):
+            continue
+        frame = f.read_frame(frame_index)
+        for k, c in enumerate(channel_indices):
+            # Channels are stored within each frame, whose channel axis
+            # read_frame squeezes away for single-channel files
+            plane = frame[c] if frame.ndim == 3 else frame
+            if projections[k] is None:
+                projections[k] = plane.copy()
+            else:
+                np.maximum(projections[k], plane, out=projections[k])
+    return projections
+
+
+def _distance_transform(mask, num_threads=-1):
+    """Euclidean distance transform as float32, threaded via the edt package when installed."""
+    if _edt is not None:
+        return _edt(mask, parallel=num_threads)
+    return distance_transform_edt(mask).astype(np.float32, copy=False)
+
+
+# Summary figures, built once per process and redrawn for every image
+_SUMMARY_FIGURES = {}
+
+
+def _summary_figure(n_rows):
+    """
+    Return the n_rows x 4 summary figure with its panels cleared.
+
+    The figure is created outside pyplot, so it never needs closing and is
+    reused across images instead of being rebuilt for each one.
+    """
+    if n_rows not in _SUMMARY_FIGURES:
+        fig = Figure(figsize=(32, 6 * n_rows))
+        _SUMMARY_FIGURES[n_rows] = (fig, fig.subplots(n_rows, 4))
+    fig, axs = _SUMMARY_FIGURES[n_rows]
+    for ax in axs.flat:
+        ax.clear()
+    _reset_layout(fig)
+    return fig, axs
+
+
+def _reset_layout(fig):
+    """Undo an earlier tight_layout so a reused figure lays out like a new one."""
+    fig.subplots_adjust(**{k: plt.rcParams[f"figure.subplot.{k}"]
+                           for k in ("left", "bottom", "right", "top", "wspace", "hspace")})
+
+
+def _init_worker():
+    """Use the non-interactive backend in worker processes."""
+    plt.switch_backend("Agg")
+
+
+def _pool_context():
+    """
+    Return the multiprocessing context for worker pools, or None to run serially.
+
+    fork is only used on Linux; it is unsafe on macOS and after numexpr or
+    OpenMP thread pools have started, so other platforms use their default
+    start method. Those workers re-import this module by name, which fails
+    when it was loaded from a file path under a name that is not importable.
+    The lookup searches sys.path only, since this module's own sys.modules
+    entry would otherwise count as importable.
+    """
+    if sys.platform.startswith("linux"):
+        return mp.get_context("fork")
+    if __name__ != "__main__" and importlib.machinery.PathFinder.find_spec(__name__) is None:
+        return None
+    return mp.get_context()
+
+
+# Legacy filename patterns, compiled once rather than on every file
+_CONDITION_RE = re.compile(r'(KO|WT|E2|E4)', flags=re.IGNORECASE)
+_REPLICATE_RE = re.compile(r'(B114|B115|B116|B117)')
+
+
+def _process_one_file(file_idx, file_info, config, model_data, num_files):
+    """
+    Analyze one ND2 file for every min_size.
+
+    Runs in a worker process when parallel processing is enabled, so it only
+    reads its arguments and returns everything it measured.
+
+    Returns:
+        dict: Image name, condition, and per-min_size thickness values,
+        average thickness and component records
+    """
+    nd2_path = file_info['path']
+    base_name = file_info['filename']
+    print(f"\n--- Processing file {file_idx}/{num_files}: {base_name} ---")
+
+    if config.use_hierarchical_structure:
+        # Use structure-based information
+        cond = file_info['condition']
+        biological_replicate = file_info['group']  # Group is the biological replicate
+        print(f"  Group (Biological Replicate): {biological_replicate}")
+        print(f"  Condition: {cond}")
+    else:
+        # Extract condition from filename (legacy method)
+        cond_match = _CONDITION_RE.search(base_name)
+        cond = cond_match.group(1).upper() if cond_match else 'UNK'
+
+        # Extract biological replicate from filename (legacy method)
+        rep_match = _REPLICATE_RE.search(base_name)
+        biological_replicate = rep_match.group(1) if rep_match else 'UNK'
+        print(f"  Detected condition: {cond}")
+        print(f"  Detected biological replicate: {biological_replicate}")
+
+    result = {
+        'image': base_name,
+        'condition': cond,
+        'thickness': {},
+        'blue_thickness': {},
+        'pink_thickness': {},
+        'avg_thickness': {},
+        'components': {min_size: [] for min_size in config.min_sizes},
+    }
+
+    # One morphology and EDT thread per worker when files are processed in parallel
+    morph_threads = 1 if config.parallel_processing["enabled"] else -1
+
+    print("  Loading image data...")
+    # nd2 reads the file's chunk map instead of scanning every chunk header
+    with nd2.ND2File(nd2_path) as f:
+        channel_names = [ch.channel.name for ch in f.metadata.channels]
+        try:
+            green_index = channel_names.index(config.fitc_channel_name)
+            print(f"  Found {config.fitc_channel_name} channel at index {green_index}")
+        except ValueError:
+            raise ValueError(f"Could not find '{config.fitc_channel_name}' channel in: " + str(channel_names))
+        if config.tritc_channel_name in channel_names:
+            red_index = channel_names.index(config.tritc_channel_name)
+        else:
+            red_index = None
+
+        print("  Extracting green channel and creating max projection...")
+        # Both projections come from a single pass over the frames
+        projections = _nd2_max_projections(f, [green_index] if red_index is None else [green_index, red_index])
+    max_proj = projections[0]
+    if config.fast_gaussian:
+        smooth_proj = fast_gaussian(max_proj, config.gaussian_sigma)
+    else:
+        smooth_proj = gaussian_filter(max_proj, sigma=config.gaussian_sigma)
+    print(f"  Max projection shape: {max_proj.shape}")
+
+    # Thresholding
+    if config.use_raw_threshold:
+        print("  Using raw threshold...")
+        threshold = config.raw_threshold_value
+        print(f"  Fixed threshold: {threshold:.2f}")
+    else:
+        print("  Calculating adaptive threshold...")
+        vals = smooth_proj.ravel()
+        thr15 = percentile_select(vals, config.percentile_threshold)
+        above15 = vals[vals > thr15]
+        mean_above15 = above15.mean() if above15.size > 0 else 0.0
+
+        if config.use_hierarchical_structure:
+            # Use group (biological replicate) for threshold offset
+            rep_offset = config.replicate_offsets.get(biological_replicate, 0.0)
+            print(f"  Group {biological_replicate}, threshold offset: {rep_offset}")
+        else:
+            # Legacy: reuse the replicate matched from the filename above
+            if rep_match:
+                rep = rep_match.group(1).upper()
+                rep_offset = config.replicate_offsets.get(rep, 0.0)
+                print(f"  Batch {rep}, threshold offset: {rep_offset}")
+            else:
+                rep_offset = 0.0
+                print("  No replicate offset found, using 0.0")
+
+        # Calculate threshold
+        if config.use_regression_model:
+            threshold = model_data['intercept'] + model_data['metric_coefficient'] * mean_above15 + rep_offset
+        else:
+            threshold = config.threshold_intercept + config.threshold_coefficient * mean_above15 + rep_offset
+        print(f"  Calculated threshold: {threshold:.2f}")
+
+    thresholded = smooth_proj > threshold
+    print(f"  Thresholded pixels: {np.sum(thresholded)}")
+
+    # Remove soma regions if TRITC channel exists
+    print(f"  Checking for {config.tritc_channel_name} channel (soma removal)...")
+    if red_index is not None:
+        print(f"  Found {config.tritc_channel_name} channel at index {red_index}")
+    else:
+        print(f"  No {config.tritc_channel_name} channel found, skipping soma removal")
+
+    if red_index is not None:
+        print(f"  Processing {config.tritc_channel_name} channel for soma removal...")
+        red_proj_original = projections[1]
+
+        # Apply Gaussian blur to the red projection
+        if config.fast_gaussian:
+            red_blur = fast_gaussian(red_proj_original, config.soma_gaussian_sigma)
+        else:
+            red_blur = gaussian_filter(red_proj_original, sigma=config.soma_gaussian_sigma)
+
+        # Compute Otsu on the blurred projection
+        blur_otsu = threshold_otsu(red_blur)
+        red_mask = red_blur > blur_otsu
+        print(f"  Initial {config.tritc_channel_name} mask pixels: {np.sum(red_mask)}")
+
+        # Distance-transform based soma extraction
+        dist = _distance_transform(red_mask, morph_threads)
+        seeds = dist >= config.distance_threshold
+        soma_mask = reconstruction(seeds.astype(np.uint8), red_mask.astype(np.uint8), method='dilation').astype(bool)
+        soma_mask = _binary_opening(soma_mask, _disk(config.opening_disk_size), morph_threads)
+        soma_mask = _binary_dilation(soma_mask, _disk(config.dilation_disk_size), morph_threads)
+
+        print(f"  Final soma mask pixels: {np.sum(soma_mask)}")
+    else:
+        soma_mask = None
+
+    # Display projections depend only on the image, not on min_size
+    max_proj_rescaled = exposure.rescale_intensity(np.asarray(max_proj, dtype=np.float32), in_range="image", out_range='float').astype(np.float32, copy=False)
+    max_proj_brighter = _brighten(max_proj_rescaled, 0.5)
+    if red_index is not None:
+        red_proj_rescaled = exposure.rescale_intensity(np.asarray(red_proj_original, dtype=np.float32), in_range='image', out_range=(0, 1))
+        red_proj_brighter = _brighten(red_proj_rescaled, 0.5)
+        not_soma = ~soma_mask
+
+    # Structuring elements used for every min_size
+    se_open_filter = _disk(config.opening_disk_size_filter)
+    se_close_filter = _disk(config.closing_disk_size_filter)
+    se_branch = _disk(config.branch_distance_threshold)
+
+    # Label the thresholded mask once; each min_size only changes which
+    # components are kept. Connectivity 1 matches remove_small_objects
+    base_labels, base_num = label(thresholded, return_num=True, connectivity=1)
+    base_sizes = np.bincount(base_labels.ravel(), minlength=base_num+1)
+
+    for min_size in config.min_sizes:
+        print(f"    Processing min_size={min_size}...")
+
+        print("      Removing small objects...")
+        keep = base_sizes >= min_size
+        keep[0] = False
+        filtered_mask = keep[base_labels]
+        print(f"      Pixels after small object removal: {np.sum(filtered_mask)}")
+
+        print("      Applying morphological operations...")
+        filtered_mask = _binary_opening(filtered_mask, se_open_filter, morph_threads)
+        filtered_mask = _binary_closing(filtered_mask, se_close_filter, morph_threads)
+
+        # Store the mask before soma removal for visualization
+        l1cam_binary_before_soma = filtered_mask
+
+        if soma_mask is not None:
+            filtered_mask = filtered_mask & not_soma
+            print("      Applied soma removal")
+
+        print("      Creating skeleton...")
+        skeleton = skeletonize(filtered_mask)
+        print(f"      Skeleton pixels: {np.sum(skeleton)}")
+
+        # Compute branch points
+        print("      Computing branch points...")
+        neighbor_count = count_neighbors_u8(skeleton.view(np.uint8))
+        branch_points = (skeleton & (neighbor_count >= 3))
+        branch_count = np.count_nonzero(branch_points)
+        total_length = np.count_nonzero(skeleton)
+        connectivity = branch_count / total_length if total_length else 0
+        print(f"      Branch points: {branch_count}, Connectivity: {connectivity:.4f}")
+
+        print("      Calculating distance transform...")
+        # Radii are kept in float32 from here on; the maps are only read and averaged
+        dist_map = _distance_transform(filtered_mask, morph_threads)
+        radius_map = np.zeros_like(dist_map)
+        radius_map[skeleton] = dist_map[skeleton]
+
+        # Thick vs Thin Analysis (if enabled)
+        if config.enable_thick_thin_analysis:
+            print("      Performing thick vs thin analysis...")
+            # Count how many branch points fall within the specified radius of each pixel
+            # uint16 counts are enough unless the disk has more than 65535 pixels
+            count_dtype = np.uint16 if se_branch.sum() <= np.iinfo(np.uint16).max else np.int32
+            branch_neighbor_count = convolve(branch_points.astype(count_dtype), se_branch.astype(count_dtype), mode='constant', cval=0)
+
+            # Initial wide regions based on radius threshold
+            initial_wide_mask = (radius_map >= config.width_threshold) & skeleton
+
+            # Re‑label as thin if the pixel is within range of too many branch points
+            near_many_branches = branch_neighbor_count >= config.branch_count_threshold
+            wide_far_from_branch = initial_wide_mask & ~near_many_branches
+            labeled_wide = label(wide_far_from_branch)
+
+            # Filter small wide regions
+            wide_sizes = np.bincount(labeled_wide.ravel())
+            keep_wide = wide_sizes >= config.min_wide_region_size
+            keep_wide[0] = False
+            wide_mask = keep_wide[labeled_wide]
+            thin_mask = skeleton & ~wide_mask
+
+            # Compute wide vs thin statistics
+            wide_count = np.count_nonzero(wide_mask)
+            thin_count = np.count_nonzero(thin_mask)
+            ratio_wide_thin = wide_count / thin_count if thin_count > 0 else np.nan
+
+            # Create color-coded thick vs thin visualization
+            h_img, w_img = max_proj.shape
+            thick_thin_img = np.zeros((h_img, w_img, 3), dtype=np.float32)
+            thick_thin_img[wide_mask, 0] = 1.0  # red for thick
+            thick_thin_img[thin_mask, 2] = 1.0  # blue for thin
+
+            # Thick vs thin visualization is now part of the summary plot only
+
+            # Add thick vs thin data to component data
+            result['components'][min_size].append(pd.DataFrame([{
+                'image': base_name,
+                'component_id': 'thick_thin',
+                'wide_count': wide_count,
+                'thin_count': thin_count,
+                'ratio_wide_thin': ratio_wide_thin,
+                'condition': cond,
+                'biological_replicate': biological_replicate
+            }]))
+
+        # Create summary plot components
+        print("      Creating summary plot...")
+
+        # Brighten radius map more aggressively for better visibility
+        radius_map_rescaled = exposure.rescale_intensity(radius_map, in_range="image", out_range='float').astype(np.float32, copy=False)
+        radius_map_brighter = _brighten(radius_map_rescaled, 0.3)  # More aggressive brightening (0.3 instead of 0.5)
+
+        # Label skeleton components
+        labeled_skel, num = label(skeleton, return_num=True, connectivity=2)
+        print(f"      Found {num} skeleton components")
+
+        # Create mask of remaining components (after min_size filtering) with
+        # one pass for the component sizes and a lookup table over the labels
+        comp_sizes = np.bincount(labeled_skel.ravel(), minlength=num+1)
+        keep_labels = comp_sizes >= min_size
+        keep_labels[0] = False
+        remaining_skeleton = keep_labels[labeled_skel]
+
+        print(f"      Remaining skeleton pixels after min_size={min_size} filtering: {np.sum(remaining_skeleton)}")
+
+        # Spider analysis on remaining skeleton
+        pink_mask = np.zeros(skeleton.shape, dtype=bool)
+
+        # Iterate over branch pixels in the remaining skeleton
+        branch_ys, branch_xs = np.nonzero(branch_points & remaining_skeleton)
+        print(f"      Analyzing {len(branch_ys)} branch points with spiders...")
+        _pink_spiders(remaining_skeleton, branch_ys, branch_xs, config.window_length, neighbor_count,
+                      radius_map, config.pink_density_threshold, config.pink_thickness_threshold, pink_mask)
+
+        # Color the skeleton
+        colored_skel = np.zeros((*skeleton.shape, 3), dtype=np.float32)
+        colored_skel[skeleton & (~remaining_skeleton)] = [1, 1, 1]  # White for excluded
+        colored_skel[remaining_skeleton] = [0.3, 0.7, 1.0]  # Light blue for remaining
+        colored_skel[pink_mask] = [1, 0, 1]  # Pink for high branch density
+
+        # Always save summary plots
+        print("      Saving summary plot...")
+
+        # l1cam_binary_before_soma is already created during processing
+        # filtered_mask is the L1CAM binary after soma removal
+        l1cam_minus_soma = filtered_mask
+
+        if config.enable_thick_thin_analysis:
+            # 3x4 layout like legacy version with thick vs thin
+            fig, axs = _summary_figure(3)
+
+            # Row 1: Initial processing steps
+            axs[0,0].imshow(max_proj_brighter, cmap='gray')
+            axs[0,0].set_title("L1CAM Max Intensity Projection")
+
+            if red_index is not None:
+                axs[0,1].imshow(red_proj_brighter, cmap='gray')
+            else:
+                axs[0,1].imshow(np.zeros_like(max_proj), cmap='gray')
+            axs[0,1].set_title("MAP2 Max Intensity Projection")
+
+            axs[0,2].imshow(np.asarray(l1cam_binary_before_soma, dtype=np.uint8), cmap='gray', vmin=0, vmax=1)
+            axs[0,2].set_title("L1CAM Binary (before soma removal)")
+
+            if soma_mask is not None:
+                axs[0,3].imshow(np.asarray(soma_mask, dtype=np.uint8), cmap='gray', vmin=0, vmax=1)
+            else:
+                axs[0,3].imshow(np.zeros_like(max_proj, dtype=bool).astype(np.uint8), cmap='gray', vmin=0, vmax=1)
+            axs[0,3].set_title("Soma Binary")
+
+            # Row 2: Processing results
+            axs[1,0].imshow(np.asarray(l1cam_minus_soma, dtype=np.uint8), cmap='gray', vmin=0, vmax=1)
+            axs[1,0].set_title("L1CAM Binary Minus Soma")
+
+            axs[1,1].imshow(colored_skel)
+            axs[1,1].set_title("Skeleton: Blue=Included, Pink=High Branch Density")
+
+            axs[1,2].imshow(radius_map_brighter, cmap="inferno")
+            axs[1,2].set_title("Skeleton Radius Map")
+
+            axs[1,3].imshow(thick_thin_img)
+            axs[1,3].set_title(f"Thick vs Thin (ratio={ratio_wide_thin:.2f})")
+
+            # Row 3: Empty for now, can be used for additional analysis
+            for j in range(4):
+                axs[2,j].axis('off')
+
+        else:
+            # 2x4 layout without thick vs thin
+            fig, axs = _summary_figure(2)
+
+            # Row 1: Initial processing steps
+            axs[0,0].imshow(max_proj_brighter, cmap='gray')
+            axs[0,0].set_title("L1CAM Max Intensity Projection")
+
+            if red_index is not None:
+                axs[0,1].imshow(red_proj_brighter, cmap='gray')
+            else:
+                axs[0,1].imshow(np.zeros_like(max_proj), cmap='gray')
+            axs[0,1].set_title("MAP2 Max Intensity Projection")
+
+            axs[0,2].imshow(np.asarray(l1cam_binary_before_soma, dtype=np.uint8), cmap='gray', vmin=0, vmax=1)
+            axs[0,2].set_title("L1CAM Binary (before soma removal)")
+
+            if soma_mask is not None:
+                axs[0,3].imshow(np.asarray(soma_mask, dtype=np.uint8), cmap='gray', vmin=0, vmax=1)
+            else:
+                axs[0,3].imshow(np.zeros_like(max_proj, dtype=bool).astype(np.uint8), cmap='gray', vmin=0, vmax=1)
+            axs[0,3].set_title("Soma Binary")
+
+            # Row 2: Processing results
+            axs[1,0].imshow(np.asarray(l1cam_minus_soma, dtype=np.uint8), cmap='gray', vmin=0, vmax=1)
+            axs[1,0].set_title("L1CAM Binary Minus Soma")
+
+            axs[1,1].imshow(colored_skel)
+            axs[1,1].set_title("Skeleton: Blue=Included, Pink=High Branch Density")
+
+            axs[1,2].imshow(radius_map_brighter, cmap="inferno")
+            axs[1,2].set_title("Skeleton Radius Map")
+
+            axs[1,3].axis('off')  # Empty panel
+
+        # Turn off axes for all panels
+        for i in range(axs.shape[0]):
+            for j in range(axs.shape[1]):
+                axs[i,j].axis("off")
+
+        # Add title with threshold information first, then adjust layout
+        if config.use_raw_threshold:
+            fig.suptitle(f"Fixed Threshold: {threshold:.1f} (Raw Threshold)", fontsize=18, y=0.95)
+        elif config.use_regression_model:
+            fig.suptitle(f"Calculated Threshold: {threshold:.1f} (Regression Model)", fontsize=18, y=0.95)
+        else:
+            fig.suptitle(f"Calculated Threshold: {threshold:.1f} (Manual Parameters)", fontsize=18, y=0.95)
+
+        # Adjust layout to make room for title and ensure visibility
+        fig.tight_layout()
+        fig.subplots_adjust(top=0.90)  # Leave more space at top for title
+
+        # Save to Images directory
+        image_dir = config.get_output_dir("images")
+        os.makedirs(image_dir, exist_ok=True)
+        # Fast deflate level for PNG (the default level spends most of the save
+        # compressing); JPEG is smaller still for the photographic panels
+        if config.summary_format == "jpg":
+            fig.savefig(os.path.join(image_dir, f"{base_name}_summary.jpg"), dpi=config.dpi, pil_kwargs={'quality': 85})
+        else:
+            fig.savefig(os.path.join(image_dir, f"{base_name}_summary.png"), dpi=config.dpi, pil_kwargs={'compress_level': 1})
+
+        # Calculate thickness statistics
+        print("      Calculating thickness statistics...")
+
+        # All-skeleton thickness for legacy plots (only remaining skeleton). The
+        # per-image value arrays are only used for CDFs, so they are stored sorted;
+        # each is a fresh gather, sorted in place once its mean is taken
+        thickness_vals = radius_map[remaining_skeleton]
+        avg_thick = thickness_vals.mean() if thickness_vals.size else 0.0
+        thickness_vals.sort()
+        result['thickness'][min_size] = thickness_vals
+        result['avg_thickness'][min_size] = avg_thick
+        print(f"      Avg thickness (remaining skeleton): {avg_thick:.2f} px")
+
+        # Blue-only thickness (exclude pink regions from remaining skeleton)
+        blue_mask = remaining_skeleton & (~pink_mask)
+        blue_vals = radius_map[blue_mask]
+        blue_vals = blue_vals[blue_vals > 0]
+
+        if blue_vals.size:
+            avg_blue = blue_vals.mean()
+            blue_vals.sort()
+            result['blue_thickness'][min_size] = blue_vals
+            print(f"      Avg blue-region thickness:   {avg_blue:.2f} px  (n={blue_vals.size})")
+        else:
+            print("      No blue pixels with non-zero thickness")
+
+        # Pink-only thickness (high branch density regions from remaining skeleton)
+        pink_vals = radius_map[pink_mask]
+        pink_vals = pink_vals[pink_vals > 0]
+
+        if pink_vals.size:
+            avg_pink = pink_vals.mean()
+            pink_vals.sort()
+            result['pink_thickness'][min_size] = pink_vals
+            print(f"      Avg pink-region thickness:   {avg_pink:.2f} px  (n={pink_vals.size})")
+        else:
+            print("      No pink pixels with non-zero thickness")
+
+
+        # Label the remaining skeleton components (blue components) AFTER removing pink
+        # regions once, for both the visualization and the component data
+        labeled_components, num_components = label(blue_mask, return_num=True)
+
+        # Create component visualization with different colors for each blue component;
+        # skipped entirely unless requested, since it is a 3-channel float image
+        if config.save_component_visualization and min_size != 0:
+            print(f"      Creating component visualization...")
+
+            print(f"        Found {num_components} blue components (after removing pink regions)")
+
+            # Generate distinct colors for each component, spacing hues by the golden ratio
+            hsv = np.empty((num_components, 3))
+            hsv[:, 0] = (np.arange(num_components) * config.golden_ratio) % 1.0
+            hsv[:, 1] = config.component_saturation
+            hsv[:, 2] = config.component_value
+            colors_list = hsv_to_rgb(hsv)
+
+            # uint8 palette: label 0 stays black and an extra last row paints pink
+            # regions gray. Scaling matches what imsave does with float input
+            palette = np.zeros((num_components + 2, 3), dtype=np.float32)
+            palette[1:-1] = colors_list
+            palette[-1] = 0.5
+            palette = (palette * 255).astype(np.uint8)
+
+            # Color each component and the pink regions in one lookup
+            labels = labeled_components.copy()
+            labels[pink_mask] = num_components + 1
+            component_img = palette[labels]
+            del labels
+
+            plt.imsave(os.path.join(config.get_output_dir("images"), f"{base_name}_components_min{min_size}.png"), component_img)
+            del component_img, palette
+
+        # Collect individual component data for ALL images
+        print(f"      Collecting component data...")
+        print(f"        Found {num_components} blue components (after removing pink regions)")
+
+        # Collect individual component data as one column-wise frame per image; labels
+        # are consecutive, so no component is empty. Means keep the radius map's
+        # precision but are stored as float64 so every run writes the same column type
+        if num_components:
+            component_means = _component_means(labeled_components, radius_map, num_components).astype(radius_map.dtype)
+            result['components'][min_size].append(pd.DataFrame({
+                'image': base_name,
+                'component_id': np.arange(1, num_components + 1),
+                'avg_thickness': component_means.astype(np.float64),
+                'condition': cond,
+                'biological_replicate': biological_replicate
+            }))
+
+    return result
+
+
+_CSV_CHUNK_ROWS = 100_000
+_ND2_SUFFIX = ".nd2"
+
+
+def _write_component_table(df, out_dir, stem, fmt, compress=False):
+    """Write a per-component table as CSV (in row chunks), gzipped CSV or parquet."""
+    if fmt == "parquet":
+        path = os.path.join(out_dir, f'{stem}.parquet')
+        try:
+            df.to_parquet(path, index=False)
+            return path
+        except ImportError:
+            print("    Warning: parquet output needs pyarrow; writing CSV instead")
+    if compress:
+        # Level 1 keeps most of gzip's size reduction at a fraction of its CPU cost
+        path = os.path.join(out_dir, f'{stem}.csv.gz')
+        df.to_csv(path, index=False, chunksize=_CSV_CHUNK_ROWS,
+                  compression={'method': 'gzip', 'compresslevel': 1})
+        return path
+    path = os.path.join(out_dir, f'{stem}.csv')
+    df.to_csv(path, index=False, chunksize=_CSV_CHUNK_ROWS)
+    return path
+
+
+def _averaged_cdf(sorted_vals, n_points=1000):
+    """
+    Average the per-image empirical CDFs of a condition on a common x-axis.
+
+    sorted_vals holds one sorted NumPy array per image, as stored by
+    _process_one_file.
+
+    Each image is linearly interpolated as interp1d(vals, cdf,
+    bounds_error=False, fill_value=(0, 1)) would, but for all images in one
+    batch of array operations. Empty images are skipped.
+
+    Returns:
+        tuple: (common_x, average_cdf, n_images), or None if every image is empty
+    """
+    sorted_vals = [v for v in sorted_vals if v.size]
+    if not sorted_vals:
+        return None
+    flat = np.concatenate(sorted_vals)
+    min_thickness = np.fromiter((v[0] for v in sorted_vals), dtype=flat.dtype).min()
+    max_thickness = np.fromiter((v[-1] for v in sorted_vals), dtype=flat.dtype).max()
+    common_x = np.linspace(min_thickness, max_thickness, n_points)
+
+    # Images are concatenated; each row of idx indexes into its own segment
+    lengths = np.array([len(v) for v in sorted_vals])
+    offsets = (np.cumsum(lengths) - lengths)[:, None]
+    idx = np.stack([np.searchsorted(v, common_x) for v in sorted_vals])
+
+    # Interpolate between the last value below x and the first value at or above it
+    n = lengths[:, None]
+    hi = np.minimum(np.maximum(idx, 1), n - 1)
+    lo = np.maximum(hi - 1, 0)
+    x_lo = flat[offsets + lo]
+    x_hi = flat[offsets + hi]
+    y_lo = (lo + 1) / n
+    y_hi = (hi + 1) / n
+    span = x_hi - x_lo
+    with np.errstate(invalid='ignore', divide='ignore'):
+        interpolated = np.where(span > 0, y_lo + (y_hi - y_lo) / span * (common_x - x_lo), y_lo)
+    interpolated[common_x < flat[offsets[:, 0]][:, None]] = 0.0
+    interpolated[common_x > flat[offsets[:, 0] + lengths - 1][:, None]] = 1.0
+    return common_x, interpolated.mean(axis=0), len(sorted_vals)
+
+
+def _plot_overlay_cdf(fig, ax, cond_data, min_size, variant, conditions, colors, config):
+    """
+    Plot the image-averaged thickness CDF of every condition on one figure.
+
+    variant is None for the whole skeleton, or "BLUE" / "PINK" for the
+    blue-only and pink-only regions, which tags the labels, title and file.
+    fig and ax are cleared and redrawn, so one figure serves every plot.
+    """
+    prefix = f"{variant}-ONLY " if variant else ""
+    tag = f" {variant}" if variant else ""
+    print(f"  Creating {prefix}overlay CDF for min_size={min_size}...")
+    ax.clear()
+    _reset_layout(fig)
+
+    for cond in conditions:
+        if len(cond_data[cond]) == 0:
+            continue
+
+        print(f"    Processing{tag} condition {cond} with {len(cond_data[cond])} images...")
+
+        # Average the per-image CDFs on a common x-axis
+        averaged = _averaged_cdf(cond_data[cond])
+        if averaged is None:
+            continue
+        common_x, average_cdf, n_images = averaged
+
+        # Plot the averaged CDF
+        ax.plot(common_x, average_cdf, color=colors[cond], label=f'{cond}{tag} (n={n_images} images)', linewidth=2)
+
+    ax.set_xlabel('Thickness (pixels)')
+    ax.set_ylabel('Cumulative Probability')
+    ax.set_title(f'{prefix}Overlay CDFs by Condition (min_size={min_size}) - Equal Image Weighting')
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    fig.tight_layout()
+    filename = f'{variant.lower()}_only_overall_condition_overlay.png' if variant else 'overall_condition_overlay.png'
+    fig.savefig(os.path.join(config.get_output_dir("plots"), filename), dpi=config.plot_dpi)
+
 
 def run_analysis(config: AnalysisConfig):
     """Run the L1CAM analysis with the provided configuration"""
@@ -39,11 +989,11 @@ def run_analysis(config: AnalysisConfig):
     
     # Load threshold parameters
     print("\n=== Threshold Parameters ===")
+    model_data = None
     if config.use_raw_threshold:
         print("Using raw threshold:")
         print(f"• Fixed threshold value: {config.raw_threshold_value:.1f}")
     elif config.use_regression_model:
-        import json
         print("Using active regression model:")
         with open(config.regression_model_path, 'r') as f:
             model_data = json.load(f)
@@ -76,34 +1026,38 @@ def run_analysis(config: AnalysisConfig):
                 
             for condition in config.conditions:
                 condition_path = os.path.join(group_path, condition)
-                if not os.path.exists(condition_path):
+                try:
+                    entries = os.scandir(condition_path)
+                except FileNotFoundError:
                     print(f"Warning: Condition directory not found: {condition_path}")
                     continue
                 
-                # Find ND2 files in this condition directory
-                for file in os.listdir(condition_path):
-                    if file.endswith(".nd2"):
-                        file_path = os.path.join(condition_path, file)
-                        nd2_files_info.append({
-                            'path': file_path,
-                            'filename': file,
-                            'group': group,
-                            'condition': condition,
-                            'biological_replicate': group  # Group serves as biological replicate
-                        })
+                # Find ND2 files in this condition directory; scandir entries carry
+                # the file type, so no extra stat per file
+                with entries:
+                    for entry in entries:
+                        if entry.name.endswith(_ND2_SUFFIX) and entry.is_file():
+                            nd2_files_info.append({
+                                'path': entry.path,
+                                'filename': entry.name,
+                                'group': group,
+                                'condition': condition,
+                                'biological_replicate': group  # Group serves as biological replicate
+                            })
         
         print(f"\nFound {len(nd2_files_info)} ND2 files across {len(config.groups)} groups and {len(config.conditions)} conditions")
     else:
         # Original flat structure
-        nd2_paths = [os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.endswith(".nd2")]
-        for nd2_path in nd2_paths:
-            nd2_files_info.append({
-                'path': nd2_path,
-                'filename': os.path.basename(nd2_path),
-                'group': None,
-                'condition': None,
-                'biological_replicate': None
-            })
+        with os.scandir(input_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(_ND2_SUFFIX) and entry.is_file():
+                    nd2_files_info.append({
+                        'path': entry.path,
+                        'filename': entry.name,
+                        'group': None,
+                        'condition': None,
+                        'biological_replicate': None
+                    })
         print(f"\nFound {len(nd2_files_info)} ND2 files to process")
 
     # Store results
@@ -113,781 +1067,102 @@ def run_analysis(config: AnalysisConfig):
     avg_thickness_per_image = {min_size: {} for min_size in min_sizes}
     image_conditions = {}
     
-    # Store individual component data
+    # Store individual component data as per-image frames, concatenated once per min_size
     component_data = {min_size: [] for min_size in min_sizes}
 
-    for file_idx, file_info in enumerate(nd2_files_info, 1):
-        nd2_path = file_info['path']
-        base_name = file_info['filename']
-        print(f"\n--- Processing file {file_idx}/{len(nd2_files_info)}: {base_name} ---")
-        
-        if config.use_hierarchical_structure:
-            # Use structure-based information
-            cond = file_info['condition']
-            biological_replicate = file_info['group']  # Group is the biological replicate
-            print(f"  Group (Biological Replicate): {biological_replicate}")
-            print(f"  Condition: {cond}")
-        else:
-            # Extract condition from filename (legacy method)
-            cond_match = re.search(r'(KO|WT|E2|E4)', base_name, flags=re.IGNORECASE)
-            cond = cond_match.group(1).upper() if cond_match else 'UNK'
-            
-            # Extract biological replicate from filename (legacy method)
-            rep_match = re.search(r'(B114|B115|B116|B117)', base_name)
-            biological_replicate = rep_match.group(1) if rep_match else 'UNK'
-            print(f"  Detected condition: {cond}")
-            print(f"  Detected biological replicate: {biological_replicate}")
-        
+    # Process files in worker processes when enabled; results come back in
+    # file order, so the merged data matches a serial run
+    jobs = [(file_idx, file_info, config, model_data, len(nd2_files_info))
+            for file_idx, file_info in enumerate(nd2_files_info, 1)]
+    max_workers = min(config.parallel_processing.get("max_workers", 4), len(jobs))
+    use_pool = config.parallel_processing["enabled"] and max_workers > 1
+    ctx = _pool_context() if use_pool else None
+    if use_pool and ctx is None:
+        print("\nWorker processes cannot import this module on this platform, processing files serially")
+    if ctx is not None:
+        print(f"\nProcessing files with {max_workers} worker processes")
+        # Recycle workers every few files to bound memory creep from matplotlib
+        with ctx.Pool(processes=max_workers, initializer=_init_worker, maxtasksperchild=4) as pool:
+            results = pool.starmap(_process_one_file, jobs)
+    else:
+        results = [_process_one_file(*job) for job in jobs]
+
+    for result in results:
+        base_name = result['image']
+        cond = result['condition']
         image_conditions[base_name] = cond
-        
-        print("  Loading image data...")
-        img = AICSImage(nd2_path)
-        try:
-            green_index = img.channel_names.index(config.fitc_channel_name)
-            print(f"  Found {config.fitc_channel_name} channel at index {green_index}")
-        except ValueError:
-            raise ValueError(f"Could not find '{config.fitc_channel_name}' channel in: " + str(img.channel_names))
-        
-        print("  Extracting green channel and creating max projection...")
-        green_channel = img.get_image_data("CZYX")[green_index]
-        max_proj = np.max(green_channel, axis=0)
-        smooth_proj = gaussian_filter(max_proj, sigma=config.gaussian_sigma)
-        print(f"  Max projection shape: {max_proj.shape}")
-        
-        # Thresholding
-        if config.use_raw_threshold:
-            print("  Using raw threshold...")
-            threshold = config.raw_threshold_value
-            print(f"  Fixed threshold: {threshold:.2f}")
-        else:
-            print("  Calculating adaptive threshold...")
-            vals = smooth_proj.ravel()
-            thr15 = np.percentile(vals, config.percentile_threshold)
-            above15 = vals[vals > thr15]
-            mean_above15 = above15.mean() if above15.size > 0 else 0.0
-            
-            if config.use_hierarchical_structure:
-                # Use group (biological replicate) for threshold offset
-                rep_offset = config.replicate_offsets.get(biological_replicate, 0.0)
-                print(f"  Group {biological_replicate}, threshold offset: {rep_offset}")
-            else:
-                # Legacy: extract from filename
-                rep_match = re.search(r'(B114|B115|B116|B117)', base_name)
-                if rep_match:
-                    rep = rep_match.group(1).upper()
-                    rep_offset = config.replicate_offsets.get(rep, 0.0)
-                    print(f"  Batch {rep}, threshold offset: {rep_offset}")
-                else:
-                    rep_offset = 0.0
-                    print("  No replicate offset found, using 0.0")
-            
-            # Calculate threshold
-            if config.use_regression_model:
-                threshold = model_data['intercept'] + model_data['metric_coefficient'] * mean_above15 + rep_offset
-            else:
-                threshold = config.threshold_intercept + config.threshold_coefficient * mean_above15 + rep_offset
-            print(f"  Calculated threshold: {threshold:.2f}")
-        
-        thresholded = smooth_proj > threshold
-        print(f"  Thresholded pixels: {np.sum(thresholded)}")
-        
-        # Remove soma regions if TRITC channel exists
-        print(f"  Checking for {config.tritc_channel_name} channel (soma removal)...")
-        try:
-            red_index = img.channel_names.index(config.tritc_channel_name)
-            print(f"  Found {config.tritc_channel_name} channel at index {red_index}")
-        except ValueError:
-            red_index = None
-            print(f"  No {config.tritc_channel_name} channel found, skipping soma removal")
-        
-        if red_index is not None:
-            print(f"  Processing {config.tritc_channel_name} channel for soma removal...")
-            red_channel = img.get_image_data("CZYX")[red_index]
-            red_proj_original = np.max(red_channel, axis=0)
-            
-            # Apply Gaussian blur to the red projection
-            red_blur = gaussian_filter(red_proj_original, sigma=config.soma_gaussian_sigma)
-            
-            # Compute Otsu on the blurred projection
-            blur_otsu = threshold_otsu(red_blur)
-            red_mask = red_blur > blur_otsu
-            print(f"  Initial {config.tritc_channel_name} mask pixels: {np.sum(red_mask)}")
-            
-            # Distance-transform based soma extraction
-            dist = distance_transform_edt(red_mask)
-            seeds = dist >= config.distance_threshold
-            soma_mask = reconstruction(seeds.astype(np.uint8), red_mask.astype(np.uint8), method='dilation').astype(bool)
-            soma_mask = opening(soma_mask, disk(config.opening_disk_size))
-            soma_mask = dilation(soma_mask, disk(config.dilation_disk_size))
-            
-            print(f"  Final soma mask pixels: {np.sum(soma_mask)}")
-        else:
-            soma_mask = None
-        
         for min_size in min_sizes:
-            print(f"    Processing min_size={min_size}...")
-            
-            print("      Removing small objects...")
-            filtered_mask = remove_small_objects(thresholded, min_size=min_size)
-            print(f"      Pixels after small object removal: {np.sum(filtered_mask)}")
-            
-            print("      Applying morphological operations...")
-            filtered_mask = opening(filtered_mask, disk(config.opening_disk_size_filter))
-            filtered_mask = closing(filtered_mask, disk(config.closing_disk_size_filter))
-            
-            # Store the mask before soma removal for visualization
-            l1cam_binary_before_soma = filtered_mask.copy()
-            
-            if soma_mask is not None:
-                filtered_mask = filtered_mask & (~soma_mask)
-                print("      Applied soma removal")
-            
-            print("      Creating skeleton...")
-            skeleton = skeletonize(filtered_mask)
-            print(f"      Skeleton pixels: {np.sum(skeleton)}")
-            
-            # Compute branch points
-            print("      Computing branch points...")
-            neighbor_kernel = np.array([[1,1,1], [1,0,1], [1,1,1]])
-            neighbor_count = convolve(skeleton.astype(int), neighbor_kernel, mode="constant", cval=0)
-            branch_points = (skeleton & (neighbor_count >= 3))
-            branch_count = np.count_nonzero(branch_points)
-            total_length = np.count_nonzero(skeleton)
-            connectivity = branch_count / total_length if total_length else 0
-            print(f"      Branch points: {branch_count}, Connectivity: {connectivity:.4f}")
-            
-            print("      Calculating distance transform...")
-            dist_map = distance_transform_edt(filtered_mask)
-            radius_map = np.zeros_like(dist_map)
-            radius_map[skeleton] = dist_map[skeleton]
-            
-            # Thick vs Thin Analysis (if enabled)
-            if config.enable_thick_thin_analysis:
-                print("      Performing thick vs thin analysis...")
-                # Count how many branch points fall within the specified radius of each pixel
-                kernel = disk(config.branch_distance_threshold).astype(int)
-                branch_neighbor_count = convolve(branch_points.astype(int), kernel, mode='constant', cval=0)
-
-                # Initial wide regions based on radius threshold
-                initial_wide_mask = (radius_map >= config.width_threshold) & skeleton
-
-                # Re‑label as thin if the pixel is within range of too many branch points
-                near_many_branches = branch_neighbor_count >= config.branch_count_threshold
-                wide_far_from_branch = initial_wide_mask & ~near_many_branches
-                labeled_wide = label(wide_far_from_branch)
-                filtered_wide_mask = np.zeros_like(initial_wide_mask, dtype=bool)
-
-                # Filter small wide regions
-                for region in regionprops(labeled_wide):
-                    if region.area >= config.min_wide_region_size:
-                        for y, x in region.coords:
-                            filtered_wide_mask[y, x] = True
-
-                wide_mask = filtered_wide_mask
-                thin_mask = skeleton & ~wide_mask
-
-                # Compute wide vs thin statistics
-                wide_count = np.count_nonzero(wide_mask)
-                thin_count = np.count_nonzero(thin_mask)
-                ratio_wide_thin = wide_count / thin_count if thin_count > 0 else np.nan
-
-                # Create color-coded thick vs thin visualization
-                h_img, w_img = max_proj.shape
-                thick_thin_img = np.zeros((h_img, w_img, 3), dtype=float)
-                thick_thin_img[wide_mask, 0] = 1.0  # red for thick
-                thick_thin_img[thin_mask, 2] = 1.0  # blue for thin
-
-                # Thick vs thin visualization is now part of the summary plot only
-
-                # Add thick vs thin data to component data
-                component_data[min_size].append({
-                    'image': base_name,
-                    'component_id': 'thick_thin',
-                    'wide_count': wide_count,
-                    'thin_count': thin_count,
-                    'ratio_wide_thin': ratio_wide_thin,
-                    'condition': cond,
-                    'biological_replicate': biological_replicate
-                })
-
-            # Create summary plot components
-            print("      Creating summary plot...")
-            max_proj_rescaled = exposure.rescale_intensity(np.asarray(max_proj, dtype=np.float32), in_range="image", out_range='float').astype(np.float32)
-            max_proj_brighter = np.clip(max_proj_rescaled ** 0.5, 0, 1)
-            
-            # Brighten radius map more aggressively for better visibility
-            radius_map_rescaled = exposure.rescale_intensity(np.asarray(radius_map, dtype=np.float32), in_range="image", out_range='float').astype(np.float32)
-            radius_map_brighter = np.clip(radius_map_rescaled ** 0.3, 0, 1)  # More aggressive brightening (0.3 instead of 0.5)
-            
-            # Label skeleton components
-            labeled_skel, num = label(skeleton, return_num=True, connectivity=2)
-            print(f"      Found {num} skeleton components")
-            
-            # Create mask of remaining components (after min_size filtering)
-            remaining_skeleton = np.zeros_like(skeleton, dtype=bool)
-            for i in range(1, num+1):
-                comp = (labeled_skel == i)
-                if np.sum(comp) >= min_size:
-                    remaining_skeleton = remaining_skeleton | comp
-            
-            print(f"      Remaining skeleton pixels after min_size={min_size} filtering: {np.sum(remaining_skeleton)}")
-            
-            # Spider analysis on remaining skeleton
-            pink_mask = np.zeros(skeleton.shape, dtype=bool)
-            
-            # Helper function for spider analysis
-            def spider_pixels(start_pix):
-                """Return all skeleton coords reachable within window_length steps."""
-                window_len = config.window_length
-                reached, frontier = {start_pix}, {start_pix}
-                for _ in range(window_len):
-                    new_frontier = set()
-                    for y, x in frontier:
-                        for dy in (-1, 0, 1):
-                            for dx in (-1, 0, 1):
-                                if dy == dx == 0:
-                                    continue
-                                ny, nx = y + dy, x + dx
-                                if (0 <= ny < skeleton.shape[0] and 0 <= nx < skeleton.shape[1]
-                                        and remaining_skeleton[ny, nx] and (ny, nx) not in reached):
-                                    reached.add((ny, nx))
-                                    new_frontier.add((ny, nx))
-                    if not new_frontier:
-                        break
-                    frontier = new_frontier
-                return reached
-
-            # Iterate over branch pixels in the remaining skeleton
-            branch_coords = np.column_stack(np.where(branch_points & remaining_skeleton))
-            print(f"      Analyzing {len(branch_coords)} branch points with spiders...")
-            
-            for by, bx in branch_coords:
-                spider = spider_pixels((by, bx))
-                spider_list = list(spider)
-                # Calculate metrics inside this spider
-                branch_cnt = 0
-                thick_vals = []
-                for sy, sx in spider_list:
-                    if neighbor_count[sy, sx] >= 3:
-                        branch_cnt += 1
-                    thick_vals.append(radius_map[sy, sx])
-                density = branch_cnt / len(spider_list) if spider_list else 0.0
-                avg_thick = np.mean(thick_vals) if thick_vals else 0.0
-
-                # Pink criterion
-                if density > config.pink_density_threshold and avg_thick >= config.pink_thickness_threshold:
-                    for sy, sx in spider_list:
-                        pink_mask[sy, sx] = True
-
-            # Color the skeleton
-            colored_skel = np.zeros((*skeleton.shape, 3), dtype=np.float32)
-            colored_skel[skeleton & (~remaining_skeleton)] = [1, 1, 1]  # White for excluded
-            colored_skel[remaining_skeleton] = [0.3, 0.7, 1.0]  # Light blue for remaining
-            colored_skel[pink_mask] = [1, 0, 1]  # Pink for high branch density
-            
-            # Process first file with extra debug info
-            sliding_window_debug = (file_idx == 1)
-
-            # Process individual components
-            total_windows = 0
-            for i in range(1, num+1):
-                comp = (labeled_skel == i)
-                comp = np.asarray(comp, dtype=bool)
-                coords = np.column_stack(np.where(comp))
-                if len(coords) == 0:
-                    continue
-                
-                # Skip components that are too small
-                if np.sum(comp) < min_size:
-                    continue
-                
-                # Progress indicator
-                if num > 50 and i % 50 == 0:
-                    print(f"        Processing component {i}/{num} ({len(coords)} pixels)... [Progress: {i/num*100:.1f}%]")
-                elif num <= 50:
-                    print(f"        Processing component {i}/{num} ({len(coords)} pixels)...")
-                
-                # Branch-based spider snakes
-                window_len = config.window_length
-                pink_spider_mask = np.zeros_like(skeleton, dtype=bool)
-
-                # Helper function for component-specific spider analysis
-                def spider_pixels_comp(start_pix):
-                    """Return all skeleton coords reachable within window_len steps."""
-                    reached, frontier = {start_pix}, {start_pix}
-                    for _ in range(window_len):
-                        new_frontier = set()
-                        for y, x in frontier:
-                            for dy in (-1, 0, 1):
-                                for dx in (-1, 0, 1):
-                                    if dy == dx == 0:
-                                        continue
-                                    ny, nx = y + dy, x + dx
-                                    if (0 <= ny < comp.shape[0] and 0 <= nx < comp.shape[1]
-                                            and comp[ny, nx] and (ny, nx) not in reached):
-                                        reached.add((ny, nx))
-                                        new_frontier.add((ny, nx))
-                        if not new_frontier:
-                            break
-                        frontier = new_frontier
-                    return reached
-
-                # Iterate over branch pixels in this component
-                branch_coords = np.column_stack(np.where(branch_points & comp))
-                for by, bx in branch_coords:
-                    spider = spider_pixels_comp((by, bx))
-                    spider_list = list(spider)
-                    # Calculate metrics inside this spider
-                    branch_cnt = 0
-                    thick_vals = []
-                    for sy, sx in spider_list:
-                        if neighbor_count[sy, sx] >= 3:
-                            branch_cnt += 1
-                        thick_vals.append(radius_map[sy, sx])
-                    density = branch_cnt / len(spider_list) if spider_list else 0.0
-                    avg_thick = np.mean(thick_vals) if thick_vals else 0.0
-
-                    # Pink criterion
-                    if density > config.pink_density_threshold and avg_thick >= config.pink_thickness_threshold:
-                        for sy, sx in spider_list:
-                            pink_spider_mask[sy, sx] = True
-
-
-                # Merge new pink spiders with global pink_mask
-                pink_mask |= pink_spider_mask
-
-            print(f"      Total sliding windows created: {total_windows}")
-            print(f"      Component processing complete for min_size={min_size}")
-            colored_skel[pink_mask] = [1, 0, 1]
-            
-            # Always save summary plots
-            print("      Saving summary plot...")
-            
-            # l1cam_binary_before_soma is already created during processing
-            # filtered_mask is the L1CAM binary after soma removal
-            l1cam_minus_soma = filtered_mask
-            
-            if config.enable_thick_thin_analysis:
-                # 3x4 layout like legacy version with thick vs thin
-                fig, axs = plt.subplots(3, 4, figsize=(32, 18))
-                
-                # Row 1: Initial processing steps
-                axs[0,0].imshow(max_proj_brighter, cmap='gray')
-                axs[0,0].set_title("L1CAM Max Intensity Projection")
-                
-                if red_index is not None:
-                    red_proj_rescaled = exposure.rescale_intensity(red_proj_original, in_range='image', out_range=(0, 1))
-                    red_proj_brighter = np.clip(red_proj_rescaled ** 0.5, 0, 1)
-                    axs[0,1].imshow(red_proj_brighter, cmap='gray')
-                else:
-                    axs[0,1].imshow(np.zeros_like(max_proj), cmap='gray')
-                axs[0,1].set_title("MAP2 Max Intensity Projection")
-                
-                axs[0,2].imshow(np.asarray(l1cam_binary_before_soma, dtype=np.uint8), cmap='gray', vmin=0, vmax=1)
-                axs[0,2].set_title("L1CAM Binary (before soma removal)")
-                
-                if soma_mask is not None:
-                    axs[0,3].imshow(np.asarray(soma_mask, dtype=np.uint8), cmap='gray', vmin=0, vmax=1)
-                else:
-                    axs[0,3].imshow(np.zeros_like(max_proj, dtype=bool).astype(np.uint8), cmap='gray', vmin=0, vmax=1)
-                axs[0,3].set_title("Soma Binary")
-                
-                # Row 2: Processing results
-                axs[1,0].imshow(np.asarray(l1cam_minus_soma, dtype=np.uint8), cmap='gray', vmin=0, vmax=1)
-                axs[1,0].set_title("L1CAM Binary Minus Soma")
-                
-                axs[1,1].imshow(colored_skel)
-                axs[1,1].set_title("Skeleton: Blue=Included, Pink=High Branch Density")
-                
-                axs[1,2].imshow(radius_map_brighter, cmap="inferno")
-                axs[1,2].set_title("Skeleton Radius Map")
-                
-                axs[1,3].imshow(thick_thin_img)
-                axs[1,3].set_title(f"Thick vs Thin (ratio={ratio_wide_thin:.2f})")
-                
-                # Row 3: Empty for now, can be used for additional analysis
-                for j in range(4):
-                    axs[2,j].axis('off')
-                    
-            else:
-                # 2x4 layout without thick vs thin
-                fig, axs = plt.subplots(2, 4, figsize=(32, 12))
-                
-                # Row 1: Initial processing steps
-                axs[0,0].imshow(max_proj_brighter, cmap='gray')
-                axs[0,0].set_title("L1CAM Max Intensity Projection")
-                
-                if red_index is not None:
-                    red_proj_rescaled = exposure.rescale_intensity(red_proj_original, in_range='image', out_range=(0, 1))
-                    red_proj_brighter = np.clip(red_proj_rescaled ** 0.5, 0, 1)
-                    axs[0,1].imshow(red_proj_brighter, cmap='gray')
-                else:
-                    axs[0,1].imshow(np.zeros_like(max_proj), cmap='gray')
-                axs[0,1].set_title("MAP2 Max Intensity Projection")
-                
-                axs[0,2].imshow(np.asarray(l1cam_binary_before_soma, dtype=np.uint8), cmap='gray', vmin=0, vmax=1)
-                axs[0,2].set_title("L1CAM Binary (before soma removal)")
-                
-                if soma_mask is not None:
-                    axs[0,3].imshow(np.asarray(soma_mask, dtype=np.uint8), cmap='gray', vmin=0, vmax=1)
-                else:
-                    axs[0,3].imshow(np.zeros_like(max_proj, dtype=bool).astype(np.uint8), cmap='gray', vmin=0, vmax=1)
-                axs[0,3].set_title("Soma Binary")
-                
-                # Row 2: Processing results
-                axs[1,0].imshow(np.asarray(l1cam_minus_soma, dtype=np.uint8), cmap='gray', vmin=0, vmax=1)
-                axs[1,0].set_title("L1CAM Binary Minus Soma")
-                
-                axs[1,1].imshow(colored_skel)
-                axs[1,1].set_title("Skeleton: Blue=Included, Pink=High Branch Density")
-                
-                axs[1,2].imshow(radius_map_brighter, cmap="inferno")
-                axs[1,2].set_title("Skeleton Radius Map")
-                
-                axs[1,3].axis('off')  # Empty panel
-            
-            # Turn off axes for all panels
-            for i in range(axs.shape[0]):
-                for j in range(axs.shape[1]):
-                    axs[i,j].axis("off")
-            
-            # Add title with threshold information first, then adjust layout
-            if config.use_raw_threshold:
-                fig.suptitle(f"Fixed Threshold: {threshold:.1f} (Raw Threshold)", fontsize=18, y=0.95)
-            elif config.use_regression_model:
-                fig.suptitle(f"Calculated Threshold: {threshold:.1f} (Regression Model)", fontsize=18, y=0.95)
-            else:
-                fig.suptitle(f"Calculated Threshold: {threshold:.1f} (Manual Parameters)", fontsize=18, y=0.95)
-            
-            # Adjust layout to make room for title and ensure visibility
-            plt.tight_layout()
-            plt.subplots_adjust(top=0.90)  # Leave more space at top for title
-            
-            # Save to Images directory
-            image_dir = config.get_output_dir("images")
-            os.makedirs(image_dir, exist_ok=True)
-            plt.savefig(os.path.join(image_dir, f"{base_name}_summary.png"), dpi=config.dpi)
-            plt.close(fig)
-            
-            # Calculate thickness statistics
-            print("      Calculating thickness statistics...")
-
-            # All-skeleton thickness for legacy plots (only remaining skeleton)
-            thickness_vals = radius_map[remaining_skeleton]
-            thickness_data[min_size][cond].append(thickness_vals)
-            avg_thick = thickness_vals.mean() if thickness_vals.size else 0.0
-            avg_thickness_per_image[min_size][base_name] = avg_thick
-            print(f"      Avg thickness (remaining skeleton): {avg_thick:.2f} px")
-
-            # Blue-only thickness (exclude pink regions from remaining skeleton)
-            blue_mask = remaining_skeleton & (~pink_mask)
-            blue_vals = radius_map[blue_mask]
-            blue_vals = blue_vals[blue_vals > 0]
-
-            if blue_vals.size:
-                blue_thickness_data[min_size][cond].append(blue_vals)
-                avg_blue = blue_vals.mean()
-                print(f"      Avg blue-region thickness:   {avg_blue:.2f} px  (n={blue_vals.size})")
-            else:
-                print("      No blue pixels with non-zero thickness")
-
-            # Pink-only thickness (high branch density regions from remaining skeleton)
-            pink_vals = radius_map[pink_mask]
-            pink_vals = pink_vals[pink_vals > 0]
-
-            if pink_vals.size:
-                pink_thickness_data[min_size][cond].append(pink_vals)
-                avg_pink = pink_vals.mean()
-                print(f"      Avg pink-region thickness:   {avg_pink:.2f} px  (n={pink_vals.size})")
-            else:
-                print("      No pink pixels with non-zero thickness")
-            
+            thickness_data[min_size][cond].append(result['thickness'][min_size])
+            avg_thickness_per_image[min_size][base_name] = result['avg_thickness'][min_size]
+            if min_size in result['blue_thickness']:
+                blue_thickness_data[min_size][cond].append(result['blue_thickness'][min_size])
+            if min_size in result['pink_thickness']:
+                pink_thickness_data[min_size][cond].append(result['pink_thickness'][min_size])
+            component_data[min_size].extend(result['components'][min_size])
 
-            # Create component visualization with different colors for each blue component
-            if sliding_window_debug and min_size != 0:
-                print(f"      Creating component visualization...")
-                
-                component_img = np.zeros((*skeleton.shape, 3), dtype=np.float32)
-                
-                # Get all remaining skeleton components (blue components) AFTER removing pink regions
-                blue_only_skeleton = remaining_skeleton & (~pink_mask)
-                labeled_components = label(blue_only_skeleton)
-                if isinstance(labeled_components, tuple):
-                    labeled_components = labeled_components[0]
-                num_components = int(labeled_components.max()) if labeled_components.max() > 0 else 0
-                
-                print(f"        Found {num_components} blue components (after removing pink regions)")
-                
-                # Generate distinct colors for each component
-                import colorsys
-                colors_list = []
-                for i in range(num_components):
-                    golden_ratio = config.golden_ratio
-                    hue = (i * golden_ratio) % 1.0
-                    saturation = config.component_saturation
-                    value = config.component_value
-                    rgb = colorsys.hsv_to_rgb(hue, saturation, value)
-                    colors_list.append(rgb)
-                
-                # Color each component with a different color
-                for component_id in range(1, num_components + 1):
-                    component_mask = (labeled_components == component_id)
-                    component_img[component_mask] = colors_list[component_id - 1]
-                
-                # Make pink regions gray
-                component_img[pink_mask] = [0.5, 0.5, 0.5]
-                
-                # Component visualization removed - no longer needed
-
-            # Collect individual component data for ALL images
-            print(f"      Collecting component data...")
-            blue_only_skeleton = remaining_skeleton & (~pink_mask)
-            labeled_components = label(blue_only_skeleton)
-            if isinstance(labeled_components, tuple):
-                labeled_components = labeled_components[0]
-            num_components = int(labeled_components.max()) if labeled_components.max() > 0 else 0
-            
-            print(f"        Found {num_components} blue components (after removing pink regions)")
-            
-            # Collect individual component data
-            for component_id in range(1, num_components + 1):
-                component_mask = (labeled_components == component_id)
-                component_thickness_vals = radius_map[component_mask]
-                if component_thickness_vals.size > 0:
-                    avg_component_thickness = np.mean(component_thickness_vals)
-                    component_data[min_size].append({
-                        'image': base_name,
-                        'component_id': component_id,
-                        'avg_thickness': avg_component_thickness,
-                        'condition': cond,
-                        'biological_replicate': biological_replicate
-                    })
+    # Combine each min_size's per-image frames once; the normalized and the
+    # component-level outputs below both read from the same table
+    component_tables = {min_size: pd.concat(frames, ignore_index=True)
+                        for min_size, frames in component_data.items() if frames}
+    del component_data
 
-    print("\n=== Creating Summary Plots ===")
-    # Overlay CDFs for all conditions for each min_size (ALL SKELETON)
-    for min_size in min_sizes:
-        print(f"  Creating overlay CDF for min_size={min_size}...")
-        plt.figure(figsize=(8,6))
-        
-        for cond in conditions:
-            if len(thickness_data[min_size][cond]) == 0:
-                continue
-                
-            print(f"    Processing condition {cond} with {len(thickness_data[min_size][cond])} images...")
-            
-            # Calculate individual image CDFs
-            image_cdfs = []
-            for thickness_vals in thickness_data[min_size][cond]:
-                if len(thickness_vals) == 0:
-                    continue
-                sorted_vals = np.sort(thickness_vals)
-                cdf = np.arange(1, len(sorted_vals) + 1) / len(sorted_vals)
-                image_cdfs.append((sorted_vals, cdf))
-            
-            if len(image_cdfs) == 0:
-                continue
-                
-            # Find the range of thickness values across all images
-            all_thicknesses = []
-            for thickness_vals in thickness_data[min_size][cond]:
-                all_thicknesses.extend(thickness_vals)
-            
-            min_thickness = min(all_thicknesses)
-            max_thickness = max(all_thicknesses)
-            
-            # Create a common x-axis
-            common_x = np.linspace(min_thickness, max_thickness, 1000)
-            
-            # Interpolate each image's CDF
-            from scipy.interpolate import interp1d
-            interpolated_cdfs = []
-            
-            for sorted_vals, cdf in image_cdfs:
-                interp_func = interp1d(sorted_vals, cdf, 
-                                      bounds_error=False, 
-                                      fill_value=(0, 1))
-                interpolated_cdf = interp_func(common_x)
-                interpolated_cdfs.append(interpolated_cdf)
-            
-            # Average the CDFs
-            average_cdf = np.mean(interpolated_cdfs, axis=0)
-            
-            # Plot the averaged CDF
-            plt.plot(common_x, average_cdf, color=colors[cond], label=f'{cond} (n={len(image_cdfs)} images)', linewidth=2)
-        
-        plt.xlabel('Thickness (pixels)')
-        plt.ylabel('Cumulative Probability')
-        plt.title(f'Overlay CDFs by Condition (min_size={min_size}) - Equal Image Weighting')
-        plt.grid(True, alpha=0.3)
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig(os.path.join(config.get_output_dir("plots"), f'overall_condition_overlay.png'), dpi=config.plot_dpi)
-        plt.close()
-
-    # Blue-only overlay CDFs
-    print("\n=== Creating BLUE-ONLY Summary Plots ===")
-    for min_size in min_sizes:
-        print(f"  Creating BLUE-ONLY overlay CDF for min_size={min_size}...")
-        plt.figure(figsize=(8,6))
-        
-        for cond in conditions:
-            if len(blue_thickness_data[min_size][cond]) == 0:
-                continue
-                
-            print(f"    Processing BLUE condition {cond} with {len(blue_thickness_data[min_size][cond])} images...")
-            
-            # Calculate individual image CDFs
-            image_cdfs = []
-            for blue_vals in blue_thickness_data[min_size][cond]:
-                if len(blue_vals) == 0:
-                    continue
-                sorted_vals = np.sort(blue_vals)
-                cdf = np.arange(1, len(sorted_vals) + 1) / len(sorted_vals)
-                image_cdfs.append((sorted_vals, cdf))
-            
-            if len(image_cdfs) == 0:
-                continue
-                
-            # Find the range of thickness values across all images
-            all_thicknesses = []
-            for blue_vals in blue_thickness_data[min_size][cond]:
-                all_thicknesses.extend(blue_vals)
-            
-            min_thickness = min(all_thicknesses)
-            max_thickness = max(all_thicknesses)
-            
-            # Create a common x-axis
-            common_x = np.linspace(min_thickness, max_thickness, 1000)
-            
-            # Interpolate each image's CDF
-            from scipy.interpolate import interp1d
-            interpolated_cdfs = []
-            
-            for sorted_vals, cdf in image_cdfs:
-                interp_func = interp1d(sorted_vals, cdf, 
-                                    bounds_error=False, 
-                                    fill_value=(0, 1))
-                interpolated_cdf = interp_func(common_x)
-                interpolated_cdfs.append(interpolated_cdf)
-            
-            # Average the CDFs
-            average_cdf = np.mean(interpolated_cdfs, axis=0)
-            
-            # Plot the averaged CDF
-            plt.plot(common_x, average_cdf, color=colors[cond], label=f'{cond} BLUE (n={len(image_cdfs)} images)', linewidth=2)
-        
-        plt.xlabel('Thickness (pixels)')
-        plt.ylabel('Cumulative Probability')
-        plt.title(f'BLUE-ONLY Overlay CDFs by Condition (min_size={min_size}) - Equal Image Weighting')
-        plt.grid(True, alpha=0.3)
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig(os.path.join(config.get_output_dir("plots"), f'blue_only_overall_condition_overlay.png'), dpi=config.plot_dpi)
-        plt.close()
-
-    # Pink-only overlay CDFs
-    print("\n=== Creating PINK-ONLY Summary Plots ===")
-    for min_size in min_sizes:
-        print(f"  Creating PINK-ONLY overlay CDF for min_size={min_size}...")
-        plt.figure(figsize=(8,6))
-        
-        for cond in conditions:
-            if len(pink_thickness_data[min_size][cond]) == 0:
-                continue
-                
-            print(f"    Processing PINK condition {cond} with {len(pink_thickness_data[min_size][cond])} images...")
-            
-            # Calculate individual image CDFs
-            image_cdfs = []
-            for pink_vals in pink_thickness_data[min_size][cond]:
-                if len(pink_vals) == 0:
-                    continue
-                sorted_vals = np.sort(pink_vals)
-                cdf = np.arange(1, len(sorted_vals) + 1) / len(sorted_vals)
-                image_cdfs.append((sorted_vals, cdf))
-            
-            if len(image_cdfs) == 0:
-                continue
-                
-            # Find the range of thickness values across all images
-            all_thicknesses = []
-            for pink_vals in pink_thickness_data[min_size][cond]:
-                all_thicknesses.extend(pink_vals)
-            
-            min_thickness = min(all_thicknesses)
-            max_thickness = max(all_thicknesses)
-            
-            # Create a common x-axis
-            common_x = np.linspace(min_thickness, max_thickness, 1000)
-            
-            # Interpolate each image's CDF
-            from scipy.interpolate import interp1d
-            interpolated_cdfs = []
-            
-            for sorted_vals, cdf in image_cdfs:
-                interp_func = interp1d(sorted_vals, cdf, 
-                                    bounds_error=False, 
-                                    fill_value=(0, 1))
-                interpolated_cdf = interp_func(common_x)
-                interpolated_cdfs.append(interpolated_cdf)
-            
-            # Average the CDFs
-            average_cdf = np.mean(interpolated_cdfs, axis=0)
-            
-            # Plot the averaged CDF
-            plt.plot(common_x, average_cdf, color=colors[cond], label=f'{cond} PINK (n={len(image_cdfs)} images)', linewidth=2)
-        
-        plt.xlabel('Thickness (pixels)')
-        plt.ylabel('Cumulative Probability')
-        plt.title(f'PINK-ONLY Overlay CDFs by Condition (min_size={min_size}) - Equal Image Weighting')
-        plt.grid(True, alpha=0.3)
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig(os.path.join(config.get_output_dir("plots"), f'pink_only_overall_condition_overlay.png'), dpi=config.plot_dpi)
-        plt.close()
+    # Overlay CDFs for each min_size: whole skeleton, then blue-only and pink-only
+    # regions, all drawn on one figure created outside pyplot
+    cdf_fig = Figure(figsize=(8,6))
+    cdf_ax = cdf_fig.subplots()
+    for data, variant in ((thickness_data, None), (blue_thickness_data, "BLUE"), (pink_thickness_data, "PINK")):
+        print(f"\n=== Creating {variant + '-ONLY ' if variant else ''}Summary Plots ===")
+        for min_size in min_sizes:
+            _plot_overlay_cdf(cdf_fig, cdf_ax, data[min_size], min_size, variant, conditions, colors, config)
 
     # Normalized component CDFs
     print("\n=== Creating Normalized Component CDFs ===")
     for min_size in min_sizes:
         print(f"  Creating normalized component data for min_size={min_size}...")
-        if component_data[min_size]:
-            df_components = pd.DataFrame(component_data[min_size])
+        if min_size in component_tables:
+            df_components = component_tables[min_size]
             
             # Calculate WT average for each biological replicate
-            wt_means = {}
+            wt_rows = df_components['condition'] == 'WT'
+            wt_means = df_components.loc[wt_rows].groupby('biological_replicate')['avg_thickness'].mean().to_dict()
             for rep in df_components['biological_replicate'].unique():
-                rep_wt_data = df_components[(df_components['biological_replicate'] == rep) & 
-                                        (df_components['condition'] == 'WT')]
-                if len(rep_wt_data) > 0:
-                    wt_means[rep] = rep_wt_data['avg_thickness'].mean()
-                else:
+                if rep not in wt_means:
                     print(f"    Warning: No WT data found for replicate {rep}")
             
             # Normalize all components by their biological replicate's WT average
             df_normalized = df_components.copy()
-            df_normalized['normalized_thickness'] = df_normalized.apply(
-                lambda row: row['avg_thickness'] / wt_means.get(row['biological_replicate'], 1.0), 
-                axis=1
-            )
+            # Replicates without WT data are left unnormalized (divided by 1.0)
+            reps = df_normalized['biological_replicate']
+            wt_divisor = reps.map(wt_means).where(reps.isin(list(wt_means)), 1.0)
+            df_normalized['normalized_thickness'] = df_normalized['avg_thickness'] / wt_divisor
             
             # Save normalized data
-            csv_path = os.path.join(config.get_output_dir("results"), f'normalized_component_data_min{min_size}.csv')
-            df_normalized.to_csv(csv_path, index=False)
-            print(f"    Saved normalized component data: {csv_path}")
+            out_path = _write_component_table(
+                df_normalized, config.get_output_dir("results"),
+                f'normalized_component_data_min{min_size}', config.normalized_data_format,
+                config.compress_component_csv)
+            print(f"    Saved normalized component data: {out_path}")
             
             # Create CDF plot for normalized data
             print(f"    Creating normalized CDF plot...")
             plt.figure(figsize=(10, 6))
             
+            # Select each condition's values from plain arrays rather than
+            # copying the whole frame per condition
+            norm_vals = df_normalized['normalized_thickness'].to_numpy()
+            norm_conds = df_normalized['condition'].to_numpy()
             for cond in conditions:
-                cond_data = df_normalized[df_normalized['condition'] == cond]
-                if len(cond_data) > 0:
+                cond_vals = norm_vals[norm_conds == cond]
+                if cond_vals.size > 0:
                     # Calculate CDF for this condition
-                    sorted_vals = np.sort(cond_data['normalized_thickness'])
-                    cdf = np.arange(1, len(sorted_vals) + 1) / len(sorted_vals)
+                    cond_vals.sort()
+                    sorted_vals = cond_vals
+                    # Built as float and divided in place: one buffer, same values
+                    cdf = np.arange(1, sorted_vals.size + 1, dtype=np.float64)
+                    cdf /= sorted_vals.size
                     
                     plt.plot(sorted_vals, cdf, color=colors[cond], 
-                            label=f'{cond} (n={len(cond_data)} components)', linewidth=2)
+                            label=f'{cond} (n={cond_vals.size} components)', linewidth=2)
             
             plt.xlabel('Normalized Thickness (relative to WT average)')
             plt.ylabel('Cumulative Probability')
@@ -909,7 +1184,7 @@ def run_analysis(config: AnalysisConfig):
         print(f"  Creating CSV reports for min_size={min_size}...")
         # Per image
         df_img = pd.DataFrame.from_records(list(avg_thickness_per_image[min_size].items()), columns=['image', 'avg_thickness'])
-        df_img['condition'] = df_img['image'].apply(lambda x: image_conditions.get(x, 'UNK'))
+        df_img['condition'] = df_img['image'].map(image_conditions).fillna('UNK')
         csv_path = os.path.join(config.get_output_dir("results"), f'avg_thickness_per_image_min{min_size}.csv')
         df_img.to_csv(csv_path, index=False)
         print(f"    Saved per-image data: {csv_path}")
@@ -924,13 +1199,15 @@ def run_analysis(config: AnalysisConfig):
     print("\n=== Generating Component-Level CSV Reports ===")
     for min_size in min_sizes:
         print(f"  Creating component-level CSV for min_size={min_size}...")
-        if component_data[min_size]:
-            df_components = pd.DataFrame(component_data[min_size])
+        if min_size in component_tables:
+            df_components = component_tables[min_size]
             
             # Split thick vs thin data into separate CSV if enabled
             if config.enable_thick_thin_analysis:
-                df_thick_thin = df_components[df_components['component_id'] == 'thick_thin'].copy()
-                df_components = df_components[df_components['component_id'] != 'thick_thin'].copy()
+                # One comparison splits the rows; only the thick/thin part is modified below
+                is_thick_thin = (df_components['component_id'] == 'thick_thin').to_numpy()
+                df_thick_thin = df_components[is_thick_thin].copy()
+                df_components = df_components[~is_thick_thin]
                 
                 # Save thick vs thin data
                 thick_thin_csv = os.path.join(config.get_output_dir("results"), f'thick_thin_data_min{min_size}.csv')
@@ -940,19 +1217,18 @@ def run_analysis(config: AnalysisConfig):
                 if config.normalize_to_wt:
                     # Normalize to WT per replicate
                     wt_ratios = df_thick_thin[df_thick_thin['condition'] == 'WT'].groupby('biological_replicate')['ratio_wide_thin'].mean()
-                    df_thick_thin['normalized_ratio'] = df_thick_thin.apply(
-                        lambda r: (r['ratio_wide_thin'] / wt_ratios[r['biological_replicate']]) * 100 
-                        if r['biological_replicate'] in wt_ratios.index else np.nan, 
-                        axis=1
-                    )
+                    # Replicates without WT data map to NaN
+                    df_thick_thin['normalized_ratio'] = (df_thick_thin['ratio_wide_thin'] / df_thick_thin['biological_replicate'].map(wt_ratios)) * 100
                     
                     # Save normalized data
                     norm_csv = os.path.join(config.get_output_dir("results"), f'normalized_thick_thin_data_min{min_size}.csv')
                     df_thick_thin.to_csv(norm_csv, index=False)
                     print(f"    Saved normalized thick vs thin data: {norm_csv}")
                     
-                    # Create summary statistics by condition
-                    summary = df_thick_thin.groupby('condition').agg({
+                    # Create summary statistics by condition; the grouping is
+                    # shared with the per-condition samples for the ANOVA below
+                    by_condition = df_thick_thin.groupby('condition')
+                    summary = by_condition.agg({
                         'ratio_wide_thin': ['mean', 'std', 'count'],
                         'normalized_ratio': ['mean', 'std']
                     }).round(3)
@@ -964,11 +1240,10 @@ def run_analysis(config: AnalysisConfig):
                     summary.to_csv(summary_csv, index=False)
                     print(f"    Saved thick vs thin summary: {summary_csv}")
                     
-                    # Perform statistical analysis
-                    from scipy.stats import f_oneway
-                    conditions = ['WT', 'KO', 'E2', 'E4']
-                    samples = {c: df_thick_thin[df_thick_thin['condition'] == c]['normalized_ratio'].dropna().values 
-                             for c in conditions}
+                    # Perform statistical analysis over the configured conditions
+                    ratios_by_condition = dict(list(by_condition['normalized_ratio']))
+                    samples = {c: ratios_by_condition[c].dropna().values
+                               for c in conditions if c in ratios_by_condition}
                     valid_samples = [s for s in samples.values() if len(s) > 0]
                     
                     if len(valid_samples) >= 2:
@@ -981,8 +1256,9 @@ def run_analysis(config: AnalysisConfig):
                         print(f"    Saved statistical analysis: {stats_txt}")
             
             # Save regular component data
-            csv_path = os.path.join(config.get_output_dir("results"), f'component_level_data_min{min_size}.csv')
-            df_components.to_csv(csv_path, index=False)
+            csv_path = _write_component_table(
+                df_components, config.get_output_dir("results"),
+                f'component_level_data_min{min_size}', "csv", config.compress_component_csv)
             print(f"    Saved component-level data: {csv_path}")
             print(f"    Total components: {len(df_components)}")
         else:
@@ -8,6 +8,12 @@ import os
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, field
 
+# Prefer the libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 
 @dataclass
 class AnalysisConfig:
@@ -49,6 +55,7 @@ class AnalysisConfig:
     distance_threshold: int = 15
     opening_disk_size: int = 20
     dilation_disk_size: int = 20
+    fast_gaussian: bool = False  # Approximate Gaussian blurs with a box filter cascade
     
     # Morphological Operations
     opening_disk_size_filter: int = 2
@@ -82,6 +89,10 @@ class AnalysisConfig:
     save_summary_plots: bool = False
     dpi: int = 300
     plot_dpi: int = 200
+    summary_format: str = "png"  # "png" or "jpg" for per-image summary figures
+    save_component_visualization: bool = False  # Save a per-image map of blue components
+    normalized_data_format: str = "csv"  # "csv" or "parquet" for normalized component data
+    compress_component_csv: bool = False  # Write component CSVs gzipped (.csv.gz)
     
     # Thick vs Thin Analysis Parameters
     enable_thick_thin_analysis: bool = False
@@ -91,6 +102,12 @@ class AnalysisConfig:
     branch_count_threshold: int = 2
     normalize_to_wt: bool = True
     
+    # Parallel Processing
+    parallel_processing: Dict[str, Any] = field(default_factory=lambda: {
+        "enabled": False,
+        "max_workers": 4
+    })
+    
     def get_output_dir(self, output_type: str) -> str:
         """
         Get the full path for a specific output type directory.
@@ -177,11 +194,22 @@ class AnalysisConfig:
         if self.gaussian_sigma <= 0:
             raise ValueError("gaussian_sigma must be positive")
         
+        if self.summary_format not in ("png", "jpg"):
+            raise ValueError("summary_format must be 'png' or 'jpg'")
+        
+        if self.normalized_data_format not in ("csv", "parquet"):
+            raise ValueError("normalized_data_format must be 'csv' or 'parquet'")
+        
         if self.window_length <= 0:
             raise ValueError("window_length must be positive")
         
         if self.pink_density_threshold < 0:
             raise ValueError("pink_density_threshold must be non-negative")
+        
+        # Validate parallel processing parameters
+        if self.parallel_processing["enabled"]:
+            if self.parallel_processing.get("max_workers", 4) <= 0:
+                raise ValueError("max_workers must be positive")
 
 
 class ConfigManager:
@@ -264,7 +292,7 @@ class ConfigManager:
             raise FileNotFoundError(f"Configuration file not found: {config_path}")
         
         with open(config_path, 'r') as file:
-            config_dict = yaml.safe_load(file)
+            config_dict = yaml.load(file, Loader=_YamlLoader)
         
         # Create AnalysisConfig instance from dictionary
         config = AnalysisConfig(**config_dict)
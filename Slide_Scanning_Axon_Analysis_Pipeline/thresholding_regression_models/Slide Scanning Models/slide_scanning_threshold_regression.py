@@ -9,6 +9,7 @@ This tool provides an interactive interface for:
 
 import os
 import json
+import concurrent.futures
 import numpy as np
 import matplotlib.pyplot as plt
 from datetime import datetime
@@ -77,31 +78,24 @@ class InteractiveRegressionTrainer:
             # Random sampling without considering replicates
             selected_images = random.sample(all_images, min(self.num_files, len(all_images)))
         
-        # Load selected images
-        for img_path in selected_images:
-            try:
-                # Load image and convert to grayscale
-                img = cv2.imread(img_path)
-                if img is None:
+        # Load selected images concurrently; cv2 decoding releases the GIL so
+        # threads overlap the reads. Results are stored in selection order
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(8, len(selected_images)))) as executor:
+            futures = [executor.submit(self._load_one, img_path) for img_path in selected_images]
+            for img_path, future in zip(selected_images, futures):
+                try:
+                    loaded = future.result()
+                except Exception as e:
+                    print(f"Error loading {img_path}: {e}")
                     continue
-                
-                # Convert to grayscale and normalize to 0-1 range (legacy method)
-                if len(img.shape) == 3:
-                    gray = np.mean(img, axis=2)  # Mean of all channels
-                else:
-                    gray = img
-                gray = gray.astype(np.float32) / 255.0  # Normalize to 0-1
-                
-                # Calculate whole image mean (legacy method)
-                mean_above = float(np.mean(gray))
+                if loaded is None:
+                    continue
+                gray, mean_above = loaded
                 
                 self.images.append(gray)  # Store normalized grayscale image
                 self.image_paths.append(img_path)
                 self.image_metrics[img_path] = mean_above
                 self.l1cam_thresholds[img_path] = self.min_threshold  # Initialize with minimum threshold
-                
-            except Exception as e:
-                print(f"Error loading {img_path}: {e}")
         
         print(f"Successfully loaded {len(self.images)} images")
         
@@ -115,6 +109,22 @@ class InteractiveRegressionTrainer:
             for biorep, count in sorted(biorep_counts.items()):
                 print(f"{biorep}: {count} images")
     
+    def _load_one(self, img_path):
+        """Load one image as normalized grayscale with its mean; None if unreadable"""
+        img = cv2.imread(img_path)
+        if img is None:
+            return None
+        
+        # Convert to grayscale and normalize to 0-1 range (legacy method)
+        if len(img.shape) == 3:
+            gray = np.mean(img, axis=2)  # Mean of all channels
+        else:
+            gray = img
+        gray = gray.astype(np.float32) / 255.0  # Normalize to 0-1
+        
+        # Calculate whole image mean (legacy method)
+        return gray, float(np.mean(gray))
+    
     def _update_display(self):
         """Update the display with current image and controls"""
         if not self.images:
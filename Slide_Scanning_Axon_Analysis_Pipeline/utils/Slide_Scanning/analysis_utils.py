@@ -3,10 +3,35 @@ Analysis utilities for slide scanning pipeline
 """
 
 import os
+import copy
+import functools
 import yaml
 import importlib.util
+import sys
 from config_manager import AnalysisConfig, ConfigManager
 
+# Prefer the libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+
+@functools.lru_cache(maxsize=8)
+def _load_yaml_cached(path, mtime_ns):
+    """
+    Parse a YAML file, reusing the result until the file is modified.
+    
+    Args:
+        path: Path to the YAML file
+        mtime_ns: Modification time of the file, part of the cache key
+        
+    Returns:
+        Parsed YAML contents (shared; copy before mutating)
+    """
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=_YamlLoader)
+
 def load_and_configure_analysis(input_dir, output_dir, active_config_dir):
     """
     Load and configure the analysis based on directory structure and config file.
@@ -25,8 +50,7 @@ def load_and_configure_analysis(input_dir, output_dir, active_config_dir):
     if not os.path.exists(config_path):
         raise FileNotFoundError(f"Configuration file not found: {config_path}")
     
-    with open(config_path, 'r') as f:
-        base_config = yaml.safe_load(f)
+    base_config = _load_yaml_cached(config_path, os.stat(config_path).st_mtime_ns)
     
     # Auto-detect groups and conditions from directory structure
     groups = []
@@ -34,15 +58,13 @@ def load_and_configure_analysis(input_dir, output_dir, active_config_dir):
     
     if os.path.exists(input_dir):
         # First level directories are bioreplicates (no name requirements)
-        groups = sorted([d for d in os.listdir(input_dir) 
-                        if os.path.isdir(os.path.join(input_dir, d))])
+        groups = sorted(entry.name for entry in os.scandir(input_dir) if entry.is_dir())
         
         if groups:
             # Get conditions from first group (assuming all groups have same conditions)
             first_group_path = os.path.join(input_dir, groups[0])
             # Second level directories are conditions (no name requirements)
-            conditions = sorted([d for d in os.listdir(first_group_path) 
-                               if os.path.isdir(os.path.join(first_group_path, d))])
+            conditions = sorted(entry.name for entry in os.scandir(first_group_path) if entry.is_dir())
     
     print(f"Auto-detected groups: {groups}")
     print(f"Auto-detected conditions: {conditions}")
@@ -51,7 +73,7 @@ def load_and_configure_analysis(input_dir, output_dir, active_config_dir):
     colors = ConfigManager.generate_colors(conditions)
     
     # Create configuration dictionary with overrides
-    config_dict = base_config.copy()
+    config_dict = copy.deepcopy(base_config)
     config_dict.update({
         "input_dir": input_dir,
         "output_dir": output_dir,
@@ -90,6 +112,8 @@ def run_analysis(config):
         os.path.join(current_dir, "slide_scanning_analysis.py")
     )
     analysis_module = importlib.util.module_from_spec(spec)
+    # Registered by name so its functions can be pickled for worker processes
+    sys.modules[spec.name] = analysis_module
     spec.loader.exec_module(analysis_module)
     
     # Run analysis
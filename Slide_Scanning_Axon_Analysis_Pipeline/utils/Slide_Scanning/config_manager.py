@@ -8,6 +8,12 @@ import os
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, field
 
+# Prefer the libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 
 @dataclass
 class AnalysisConfig:
@@ -93,7 +99,7 @@ class AnalysisConfig:
     
     # Slide Scanning Specific Parameters
     parallel_processing: Dict[str, Any] = field(default_factory=lambda: {
-        "enabled": True,
+        "enabled": False,
         "max_workers": 12,
         "chunk_size": 3,
         "progress_update_interval": 5,
@@ -183,9 +189,9 @@ class AnalysisConfig:
         
         # Validate parallel processing parameters
         if self.parallel_processing["enabled"]:
-            if self.parallel_processing["max_workers"] <= 0:
+            if self.parallel_processing.get("max_workers", 12) <= 0:
                 raise ValueError("max_workers must be positive")
-            if self.parallel_processing["chunk_size"] <= 0:
+            if self.parallel_processing.get("chunk_size", 3) <= 0:
                 raise ValueError("chunk_size must be positive")
 
 
@@ -275,7 +281,7 @@ class ConfigManager:
             raise FileNotFoundError(f"Configuration file not found: {config_path}")
         
         with open(config_path, 'r') as file:
-            config_dict = yaml.safe_load(file)
+            config_dict = yaml.load(file, Loader=_YamlLoader)
         
         # Create AnalysisConfig instance from dictionary
         config = AnalysisConfig(**config_dict)
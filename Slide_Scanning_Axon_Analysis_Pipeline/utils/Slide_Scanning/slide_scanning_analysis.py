@@ -5,11 +5,11 @@ Based on the legacy model from L1CAM P2 comprehensive analysis
 
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from skimage import exposure, filters, morphology, measure, color
 from skimage.filters import threshold_otsu
 import os
 from skimage.morphology import skeletonize, remove_small_objects, label, closing, opening, disk, dilation, reconstruction
-from skimage.measure import regionprops
 from skimage.color import label2rgb
 from scipy.ndimage import gaussian_filter, convolve, distance_transform_edt
 import pandas as pd
@@ -54,6 +54,9 @@ FILTER_PARAMS = {
     "MIN_AVG_THICKNESS_PINK": 3,      # Minimum average thickness for pink regions (radius in pixels)
 }
 
+# Most points drawn per CDF curve; larger pooled datasets are decimated
+CDF_PLOT_POINTS = 10000
+
 def load_image(image_path, config):
     """Load image from various formats supported by slide scanning."""
     try:
@@ -94,16 +97,9 @@ def calculate_threshold(image, config):
     """Calculate threshold based on configuration."""
     if config.use_raw_threshold:
         return config.raw_threshold_value
-    elif config.use_regression_model:
-        # Implement regression model logic if needed
-        # For now, fallback to manual calculation
-        vals = image.ravel()
-        thr15 = np.percentile(vals, config.percentile_threshold)
-        above15 = vals[vals > thr15]
-        mean_above15 = above15.mean() if above15.size > 0 else 0.0
-        return config.threshold_intercept + config.threshold_coefficient * mean_above15
     else:
-        # Manual threshold calculation
+        # Manual threshold calculation; the regression model path has no logic
+        # of its own yet and shares this one
         vals = image.ravel()
         thr15 = np.percentile(vals, config.percentile_threshold)
         above15 = vals[vals > thr15]
@@ -141,23 +137,18 @@ def spider_analysis(skeleton, branch_points, thickness):
         if len(spider_coords) == 0:
             continue
             
-        # Calculate branch density in spider
-        branch_count = 0
-        thickness_values = []
-        
-        for sy, sx in spider_coords:
-            if branch_points[sy, sx]:
-                branch_count += 1
-            thickness_values.append(thickness[sy, sx])
+        # Calculate branch density in spider, gathering the window's pixels as
+        # index arrays instead of building per-pixel Python lists
+        ys, xs = np.array(spider_coords).T
+        branch_count = np.count_nonzero(branch_points[ys, xs])
         
-        density = branch_count / len(spider_coords) if spider_coords else 0
-        avg_thickness = np.mean(thickness_values) if thickness_values else 0
+        density = branch_count / len(spider_coords)
+        avg_thickness = thickness[ys, xs].mean()
         
         # Apply pink criteria (legacy values)
         if (density > FILTER_PARAMS["BRANCH_DENSITY_THRESHOLD"] and 
             avg_thickness >= FILTER_PARAMS["MIN_AVG_THICKNESS_PINK"]):
-            for sy, sx in spider_coords:
-                pink_mask[sy, sx] = True
+            pink_mask[ys, xs] = True
     
     return pink_mask
 
@@ -195,12 +186,9 @@ def calculate_thick_thin_analysis(skeleton, distance_map, config):
     if not config.enable_thick_thin_analysis:
         return None, None, np.nan
     
-    # Calculate radius at each skeleton point
-    radius_map = np.zeros_like(skeleton, dtype=float)
-    radius_map[skeleton] = distance_map[skeleton]
-    
-    # Classify as thick or thin based on width threshold
-    thick_mask = (radius_map >= config.width_threshold) & skeleton
+    # Classify as thick or thin based on width threshold; the radius at a
+    # skeleton point is the distance map there, so no separate map is built
+    thick_mask = (distance_map >= config.width_threshold) & skeleton
     thin_mask = skeleton & ~thick_mask
     
     # Count pixels
@@ -224,9 +212,11 @@ def process_single_image(image_path, config, condition, biological_replicate):
     # Convert to grayscale using legacy method (mean of all channels) and normalize
     gray = extract_grayscale_legacy(image, config)
     print(f"    Image shape: {gray.shape}, dtype: {gray.dtype}")
-    print(f"    Image intensity range: {gray.min():.1f} - {gray.max():.1f}")
+    # One percentile call sorts the image once for the range and all quantiles
+    p0, p50, p90, p95, p99, p100 = np.percentile(gray, [0, 50, 90, 95, 99, 100])
+    print(f"    Image intensity range: {p0:.1f} - {p100:.1f}")
     print(f"    Image mean: {gray.mean():.1f}, std: {gray.std():.1f}")
-    print(f"    Image percentiles - 50th: {np.percentile(gray, 50):.1f}, 90th: {np.percentile(gray, 90):.1f}, 95th: {np.percentile(gray, 95):.1f}, 99th: {np.percentile(gray, 99):.1f}")
+    print(f"    Image percentiles - 50th: {p50:.1f}, 90th: {p90:.1f}, 95th: {p95:.1f}, 99th: {p99:.1f}")
     
     # Apply Gaussian smoothing
     smooth_gray = gaussian_filter(gray, sigma=config.gaussian_sigma)
@@ -259,28 +249,28 @@ def process_single_image(image_path, config, condition, biological_replicate):
     
     # Filter skeleton by component size (legacy approach)
     print(f"    Filtering skeleton components by size...")
-    skeleton_labeled = label(skeleton)
-    skeleton_components = regionprops(skeleton_labeled)
+    skeleton_labeled, num_labels = label(skeleton, return_num=True)
     
     # Create mask for valid skeleton components (≥ MIN_SKELETON_LENGTH pixels)
-    valid_components_mask = np.zeros_like(skeleton, dtype=bool)
-    valid_component_count = 0
-    for prop in skeleton_components:
-        if len(prop.coords) >= FILTER_PARAMS["MIN_SKELETON_LENGTH"]:
-            coords = prop.coords
-            for y, x in coords:
-                valid_components_mask[y, x] = True
-            valid_component_count += 1
+    # with one per-label lookup instead of painting each component's pixels
+    component_sizes = np.bincount(skeleton_labeled.ravel(), minlength=num_labels + 1)
+    keep = component_sizes >= FILTER_PARAMS["MIN_SKELETON_LENGTH"]
+    keep[0] = False
+    valid_components_mask = keep[skeleton_labeled]
+    valid_component_count = np.count_nonzero(keep)
     
     print(f"    Valid skeleton components (≥{FILTER_PARAMS['MIN_SKELETON_LENGTH']} pixels): {valid_component_count}")
     
     # Apply thickness filter to skeleton (legacy approach)
     thickness_mask = ((thickness >= FILTER_PARAMS["MIN_THICKNESS"]) & 
                      (thickness <= FILTER_PARAMS["MAX_THICKNESS"]))
-    print(f"    Pixels passing thickness filter: {np.sum(thickness_mask & valid_components_mask)} / {np.sum(valid_components_mask)}")
     
-    # Apply thickness filter to skeleton
+    # Apply thickness filter to skeleton; each mask is counted once and the
+    # counts are reused for the log lines and the returned lengths
     filtered_skeleton = valid_components_mask & thickness_mask
+    valid_pixel_count = np.count_nonzero(valid_components_mask)
+    filtered_pixel_count = np.count_nonzero(filtered_skeleton)
+    print(f"    Pixels passing thickness filter: {filtered_pixel_count} / {valid_pixel_count}")
     
     # Perform spider analysis on the remaining skeleton (after size and thickness filtering)
     pink_mask = spider_analysis(filtered_skeleton, branch_points, thickness)
@@ -289,12 +279,14 @@ def process_single_image(image_path, config, condition, biological_replicate):
     # Blue region: normal branch density
     # Pink region: high branch density (assigned by spider analysis)
     blue_mask = filtered_skeleton & ~pink_mask
+    blue_pixel_count = np.count_nonzero(blue_mask)
+    pink_pixel_count = np.count_nonzero(pink_mask)
     
-    print(f"    All skeleton pixels: {np.sum(skeleton > 0)}")
-    print(f"    Valid skeleton pixels (≥{FILTER_PARAMS['MIN_SKELETON_LENGTH']} pixels): {np.sum(skeleton & valid_components_mask)}")
-    print(f"    Pixels after thickness filter: {np.sum(filtered_skeleton > 0)}")
-    print(f"    Blue region pixels: {np.sum(blue_mask)}")
-    print(f"    Pink region pixels: {np.sum(pink_mask)}")
+    print(f"    All skeleton pixels: {np.count_nonzero(skeleton)}")
+    print(f"    Valid skeleton pixels (≥{FILTER_PARAMS['MIN_SKELETON_LENGTH']} pixels): {valid_pixel_count}")
+    print(f"    Pixels after thickness filter: {filtered_pixel_count}")
+    print(f"    Blue region pixels: {blue_pixel_count}")
+    print(f"    Pink region pixels: {pink_pixel_count}")
     
     # Thick vs thin analysis
     thick_mask, thin_mask, ratio_thick_thin = calculate_thick_thin_analysis(
@@ -322,18 +314,46 @@ def process_single_image(image_path, config, condition, biological_replicate):
         'thick_count': np.count_nonzero(thick_mask) if thick_mask is not None else 0,
         'thin_count': np.count_nonzero(thin_mask) if thin_mask is not None else 0,
         'ratio_thick_thin': ratio_thick_thin,
-        'total_skeleton_length': np.count_nonzero(filtered_skeleton),
-        'blue_skeleton_length': np.count_nonzero(blue_mask),
-        'pink_skeleton_length': np.count_nonzero(pink_mask)
+        'total_skeleton_length': filtered_pixel_count,
+        'blue_skeleton_length': blue_pixel_count,
+        'pink_skeleton_length': pink_pixel_count
     }
 
+# Summary figure, built once per process and redrawn for every image
+_SUMMARY_FIGURE = None
+
+
+def _summary_figure():
+    """
+    Return the 2x2 summary figure with its panels cleared.
+
+    The figure is created outside pyplot, so it never needs closing and is
+    reused across images instead of being rebuilt for each one.
+    """
+    global _SUMMARY_FIGURE
+    if _SUMMARY_FIGURE is None:
+        fig = Figure(figsize=(12, 12))
+        _SUMMARY_FIGURE = (fig, fig.subplots(2, 2))
+    fig, axs = _SUMMARY_FIGURE
+    for ax in axs.flat:
+        ax.clear()
+    _reset_layout(fig)
+    return fig, axs
+
+
+def _reset_layout(fig):
+    """Undo an earlier tight_layout so a reused figure lays out like a new one."""
+    fig.subplots_adjust(**{k: plt.rcParams[f"figure.subplot.{k}"]
+                           for k in ("left", "bottom", "right", "top", "wspace", "hspace")})
+
+
 def save_summary_plot(image_path, gray, filtered_mask, skeleton, blue_mask, pink_mask, 
                      thick_mask, thin_mask, threshold, config, distance_map=None):
     """Save summary plot for the image."""
     base_name = os.path.splitext(os.path.basename(image_path))[0]
     
-    # Create 2x2 figure
-    fig, axs = plt.subplots(2, 2, figsize=(12, 12))
+    # Reuse the 2x2 figure
+    fig, axs = _summary_figure()
     
     # Brighten original image
     from skimage import exposure
@@ -361,14 +381,12 @@ def save_summary_plot(image_path, gray, filtered_mask, skeleton, blue_mask, pink
     thickness_filtered_colored = np.zeros((*skeleton.shape, 3))
     
     # Calculate thickness mask for visualization
-    if distance_map is not None and np.sum(skeleton) > 0:
-        thickness_values = np.zeros_like(skeleton, dtype=float)
-        thickness_values[skeleton] = distance_map[skeleton]
-        
-        # Show different thickness categories
-        valid_thickness = (thickness_values >= FILTER_PARAMS["MIN_THICKNESS"]) & (thickness_values <= FILTER_PARAMS["MAX_THICKNESS"]) & skeleton
-        excluded_thick = (thickness_values > FILTER_PARAMS["MAX_THICKNESS"]) & skeleton
-        excluded_thin = (thickness_values < FILTER_PARAMS["MIN_THICKNESS"]) & skeleton
+    if distance_map is not None and skeleton.any():
+        # Show different thickness categories; every mask is limited to the
+        # skeleton, so the distance map is compared directly
+        valid_thickness = (distance_map >= FILTER_PARAMS["MIN_THICKNESS"]) & (distance_map <= FILTER_PARAMS["MAX_THICKNESS"]) & skeleton
+        excluded_thick = (distance_map > FILTER_PARAMS["MAX_THICKNESS"]) & skeleton
+        excluded_thin = (distance_map < FILTER_PARAMS["MIN_THICKNESS"]) & skeleton
         
         # Color coding: Blue for normal, Pink for high branch density, Yellow for excluded thick
         thickness_filtered_colored[blue_mask] = [0, 0, 1]  # Blue for normal regions
@@ -403,12 +421,28 @@ def save_summary_plot(image_path, gray, filtered_mask, skeleton, blue_mask, pink
     
     # Add title with threshold
     fig.suptitle(f'{base_name} - Threshold: {threshold:.4f}', fontsize=16)
-    plt.tight_layout()
+    fig.tight_layout()
     
     # Save plot
     output_path = os.path.join(config.get_output_dir("images"), f"{base_name}_summary.png")
-    plt.savefig(output_path, dpi=config.dpi, bbox_inches='tight')
-    plt.close()
+    fig.savefig(output_path, dpi=config.dpi, bbox_inches='tight')
+
+def _init_worker():
+    """Use the non-interactive backend in worker processes."""
+    plt.switch_backend("Agg")
+
+
+def _process_file(job, config, num_files):
+    """Process one (index, file_info) job; runs in the parent or in a worker process."""
+    i, file_info = job
+    print(f"\nProcessing image {i}/{num_files}: {file_info['filename']}")
+    return process_single_image(
+        file_info['path'],
+        config,
+        file_info['condition'],
+        file_info['biological_replicate']
+    )
+
 
 def run_analysis(config: AnalysisConfig):
     """Run the slide scanning L1CAM analysis."""
@@ -421,6 +455,7 @@ def run_analysis(config: AnalysisConfig):
     
     # Collect image files
     image_files_info = []
+    image_exts = tuple(config.image_formats)
     
     if config.use_hierarchical_structure:
         print(f"\nUsing hierarchical structure: Groups -> Conditions -> Images")
@@ -433,35 +468,37 @@ def run_analysis(config: AnalysisConfig):
                 
             for condition in config.conditions:
                 condition_path = os.path.join(group_path, condition)
-                if not os.path.exists(condition_path):
+                try:
+                    entries = os.scandir(condition_path)
+                except FileNotFoundError:
                     print(f"Warning: Condition directory not found: {condition_path}")
                     continue
                 
-                # Find image files
-                for file in os.listdir(condition_path):
-                    if any(file.lower().endswith(ext) for ext in config.image_formats):
-                        file_path = os.path.join(condition_path, file)
-                        image_files_info.append({
-                            'path': file_path,
-                            'filename': file,
-                            'group': group,
-                            'condition': condition,
-                            'biological_replicate': group
-                        })
+                # Find image files; scandir entries carry the file type, so no extra stat per file
+                with entries:
+                    for entry in entries:
+                        if entry.name.lower().endswith(image_exts) and entry.is_file():
+                            image_files_info.append({
+                                'path': entry.path,
+                                'filename': entry.name,
+                                'group': group,
+                                'condition': condition,
+                                'biological_replicate': group
+                            })
         
         print(f"\nFound {len(image_files_info)} images across {len(config.groups)} groups and {len(config.conditions)} conditions")
     else:
         # Flat structure
-        for file in os.listdir(config.input_dir):
-            if any(file.lower().endswith(ext) for ext in config.image_formats):
-                file_path = os.path.join(config.input_dir, file)
-                image_files_info.append({
-                    'path': file_path,
-                    'filename': file,
-                    'group': None,
-                    'condition': None,
-                    'biological_replicate': None
-                })
+        with os.scandir(config.input_dir) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(image_exts) and entry.is_file():
+                    image_files_info.append({
+                        'path': entry.path,
+                        'filename': entry.name,
+                        'group': None,
+                        'condition': None,
+                        'biological_replicate': None
+                    })
         print(f"\nFound {len(image_files_info)} images to process")
     
     # Process images
@@ -471,25 +508,33 @@ def run_analysis(config: AnalysisConfig):
     pink_thickness_data = {condition: [] for condition in config.conditions}
     
     print(f"\n=== Processing Images ===")
-    for i, file_info in enumerate(image_files_info, 1):
-        print(f"\nProcessing image {i}/{len(image_files_info)}: {file_info['filename']}")
-        
-        result = process_single_image(
-            file_info['path'], 
-            config, 
-            file_info['condition'], 
-            file_info['biological_replicate']
-        )
-        
+    # Images are independent, so they are processed in worker processes when
+    # enabled; map returns results in file order, so merging matches a serial run
+    jobs = list(enumerate(image_files_info, 1))
+    process = partial(_process_file, config=config, num_files=len(jobs))
+    # Each worker holds a full slide image and its float maps, so never run
+    # more workers than CPUs
+    max_workers = min(config.parallel_processing.get("max_workers", 12), os.cpu_count() or 1, len(jobs))
+    if config.parallel_processing["enabled"] and max_workers > 1:
+        print(f"Processing images with {max_workers} worker processes")
+        # fork is unsafe on macOS and after numexpr/OpenMP thread pools have
+        # started, so other platforms use their default start method
+        ctx = mp.get_context("fork") if sys.platform.startswith("linux") else mp.get_context()
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx, initializer=_init_worker) as executor:
+            image_results = list(executor.map(process, jobs, chunksize=config.parallel_processing.get("chunk_size", 3)))
+    else:
+        image_results = map(process, jobs)
+
+    for result in image_results:
         if result:
             results.append(result)
             
             # Collect thickness data for CDFs
-            if len(result['all_thickness']) > 0:
+            if result['all_thickness'].size:
                 thickness_data[result['condition']].append(result['all_thickness'])
-            if len(result['blue_thickness']) > 0:
+            if result['blue_thickness'].size:
                 blue_thickness_data[result['condition']].append(result['blue_thickness'])
-            if len(result['pink_thickness']) > 0:
+            if result['pink_thickness'].size:
                 pink_thickness_data[result['condition']].append(result['pink_thickness'])
     
     # Generate summary statistics
@@ -501,10 +546,12 @@ def run_analysis(config: AnalysisConfig):
     results_df.to_csv(results_csv, index=False)
     print(f"Saved individual results: {results_csv}")
     
-    # Generate CDF plots
-    generate_cdf_plots(thickness_data, "All Skeleton", config)
-    generate_cdf_plots(blue_thickness_data, "Blue Regions", config)
-    generate_cdf_plots(pink_thickness_data, "Pink Regions", config)
+    # Generate CDF plots, all drawn on one figure created outside pyplot
+    cdf_fig = Figure(figsize=(10, 6))
+    cdf_fig.subplots()
+    generate_cdf_plots(thickness_data, "All Skeleton", config, cdf_fig)
+    generate_cdf_plots(blue_thickness_data, "Blue Regions", config, cdf_fig)
+    generate_cdf_plots(pink_thickness_data, "Pink Regions", config, cdf_fig)
     
     # Generate thick vs thin analysis if enabled
     if config.enable_thick_thin_analysis:
@@ -513,9 +560,19 @@ def run_analysis(config: AnalysisConfig):
     print(f"\n=== Analysis Complete ===")
     print(f"Results saved to: {config.output_dir}")
 
-def generate_cdf_plots(thickness_data, region_name, config):
-    """Generate CDF plots for thickness data."""
-    plt.figure(figsize=(10, 6))
+def generate_cdf_plots(thickness_data, region_name, config, fig=None):
+    """
+    Generate CDF plots for thickness data.
+
+    fig, if given, is a single-axes Figure that is cleared and redrawn, so
+    one figure can serve several calls.
+    """
+    if fig is None:
+        fig = Figure(figsize=(10, 6))
+        fig.subplots()
+    ax = fig.axes[0]
+    ax.clear()
+    _reset_layout(fig)
     
     for condition in config.conditions:
         if condition not in thickness_data or len(thickness_data[condition]) == 0:
@@ -523,29 +580,40 @@ def generate_cdf_plots(thickness_data, region_name, config):
         
         # Combine all thickness values for this condition
         all_values = np.concatenate(thickness_data[condition])
-        if len(all_values) == 0:
+        if all_values.size == 0:
             continue
         
         # Calculate CDF
-        sorted_values = np.sort(all_values)
-        cdf = np.arange(1, len(sorted_values) + 1) / len(sorted_values)
+        # concatenate always returns a new array, so it is sorted in place
+        all_values.sort()
+        sorted_values = all_values
+        n = sorted_values.size
+        if n > CDF_PLOT_POINTS:
+            # Draw evenly spaced quantiles (first and last included) instead of
+            # every pixel; the curve is unchanged at plot resolution
+            ranks = np.linspace(0, n - 1, CDF_PLOT_POINTS).astype(np.intp)
+            sorted_values = sorted_values[ranks]
+            cdf = (ranks + 1) / n
+        else:
+            # Built as float and divided in place: one buffer, same values
+            cdf = np.arange(1, n + 1, dtype=np.float64)
+            cdf /= n
         
         # Plot
-        plt.plot(sorted_values, cdf, label=f"{condition} (n={len(all_values)})", 
+        ax.plot(sorted_values, cdf, label=f"{condition} (n={len(all_values)})", 
                 color=config.colors.get(condition, 'gray'), linewidth=2)
     
-    plt.xlabel('Thickness (pixels)')
-    plt.ylabel('Cumulative Probability')
-    plt.title(f'{region_name} Thickness CDF by Condition')
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
+    ax.set_xlabel('Thickness (pixels)')
+    ax.set_ylabel('Cumulative Probability')
+    ax.set_title(f'{region_name} Thickness CDF by Condition')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
     
     # Save plot
     filename = f"{region_name.lower().replace(' ', '_')}_thickness_cdf.png"
     output_path = os.path.join(config.get_output_dir("plots"), filename)
-    plt.savefig(output_path, dpi=config.plot_dpi, bbox_inches='tight')
-    plt.close()
+    fig.savefig(output_path, dpi=config.plot_dpi, bbox_inches='tight')
     print(f"Saved CDF plot: {output_path}")
 
 def generate_thick_thin_analysis(results_df, config):
@@ -566,25 +634,25 @@ def generate_thick_thin_analysis(results_df, config):
     print(f"Saved thick vs thin analysis: {thick_thin_csv}")
     
     # Generate summary plot
-    plt.figure(figsize=(10, 6))
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
     
     for condition in config.conditions:
         condition_data = valid_results[valid_results['condition'] == condition]
         if len(condition_data) > 0:
-            plt.scatter([condition] * len(condition_data), condition_data['ratio_thick_thin'],
+            ax.scatter([condition] * len(condition_data), condition_data['ratio_thick_thin'],
                        color=config.colors.get(condition, 'gray'), alpha=0.7, s=50)
     
-    plt.ylabel('Thick:Thin Ratio')
-    plt.xlabel('Condition')
-    plt.title('Thick vs Thin Ratio by Condition')
-    plt.xticks(rotation=45)
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
+    ax.set_ylabel('Thick:Thin Ratio')
+    ax.set_xlabel('Condition')
+    ax.set_title('Thick vs Thin Ratio by Condition')
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
     
     # Save plot
     output_path = os.path.join(config.get_output_dir("plots"), "thick_thin_ratio_by_condition.png")
-    plt.savefig(output_path, dpi=config.plot_dpi, bbox_inches='tight')
-    plt.close()
+    fig.savefig(output_path, dpi=config.plot_dpi, bbox_inches='tight')
     print(f"Saved thick vs thin plot: {output_path}")
 
 def main():